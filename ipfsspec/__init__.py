@@ -7,4 +7,12 @@ except PackageNotFoundError:
     # package is not installed
     pass
 
-__all__ = ["__version__", "AsyncIPFSFileSystem", "AsyncIPNSFileSystem"]
+__all__ = ["__version__", "AsyncIPFSFileSystem", "AsyncIPNSFileSystem", "CARFileSystem"]
+
+
+def __getattr__(name):
+    # CAR support pulls in the codecs, it's only imported when requested
+    if name == "CARFileSystem":
+        from .carfs import CARFileSystem
+        return CARFileSystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,48 +1,78 @@
-import io
+import atexit
 import os
 import platform
+import re
+import time
 import weakref
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
+from urllib.parse import unquote
 from contextlib import asynccontextmanager
 import warnings
 
 import asyncio
-import aiohttp
-import aiohttp_retry
 
-from fsspec.asyn import AsyncFileSystem, sync, sync_wrapper
+from fsspec.asyn import AbstractAsyncStreamedFile, AsyncFileSystem, get_loop, sync, sync_wrapper
 from fsspec.exceptions import FSTimeoutError
 from fsspec.callbacks import DEFAULT_CALLBACK
+from fsspec.spec import AbstractBufferedFile, make_instance
 from fsspec.utils import isfilelike
 
-from multiformats import CID, multicodec
-from . import unixfsv1
-from .car import read_car
-
 import logging
 
 logger = logging.getLogger("ipfsspec")
 
-DagPbCodec = multicodec.get("dag-pb")
-RawCodec = multicodec.get("raw")
+SUBTREE_FILL_BYTES = 64 * 2**20
+# default of ``retry_attempts`` for filesystems with several gateways
+MULTI_GATEWAY_RETRY_ATTEMPTS = 1
 
 class RequestsTooQuick(OSError):
     def __init__(self, retry_after=None):
         self.retry_after = retry_after
 
 
+UNIX_SOCKET_SCHEME = "http+unix://"
+
+
 class AsyncIPFSGateway:
+    """
+    Trustless gateway at ``url``.
+
+    Besides ``http(s)://`` URLs, gateways listening on a Unix domain socket
+    can be addressed as ``http+unix:///path/to/gateway.sock`` (or with the
+    socket path percent-encoded as host, e.g. ``http+unix://%2Frun%2Fgateway.sock``).
+    Sessions used with such a gateway must be created with the ``unix_socket``
+    option of :func:`get_client`.
+
+    Gateways which misbehave can be put into :meth:`quarantine`, filesystems
+    configured with several gateways prefer the others in the meantime.
+    """
     resolution = "path"
 
     def __init__(self, url, protocol="ipfs"):
         self.url = url
         self.protocol = protocol
+        self.unix_socket = None
+        self.base_url = url
+        if url.startswith(UNIX_SOCKET_SCHEME):
+            location = url[len(UNIX_SOCKET_SCHEME):]
+            self.unix_socket = location if location.startswith("/") else unquote(location)
+            self.base_url = "http://localhost"
+        self.quarantined_until = 0.0
+
+    def quarantine(self, seconds):
+        self.quarantined_until = time.monotonic() + seconds
+
+    @property
+    def available(self):
+        return self.quarantined_until <= time.monotonic()
 
     async def _cid_req(self, method, path, headers=None, **kwargs):
         headers = headers or {}
         if self.resolution == "path":
-            res = await method("/".join((self.url, self.protocol,  path)), trace_request_ctx={'gateway': self.url}, headers=headers, **kwargs)
+            res = await method("/".join((self.base_url, self.protocol,  path)), trace_request_ctx={'gateway': self.url}, headers=headers, **kwargs)
         elif self.resolution == "subdomain":
             raise NotImplementedError("subdomain resolution is not yet implemented")
         else:
@@ -71,168 +101,126 @@ class AsyncIPFSGateway:
 
     @staticmethod
     def _verify_merkle_path(path, blocks):
-        """
-        Verify that blocks form a valid chain from root CID through path segments.
-
-        According to the trustless gateway spec, dag-scope=block returns blocks
-        needed to verify path segments. This function validates the chain of custody
-        by checking that each parent block contains a PBLink to its child.
-
-        Args:
-            path: Full path like "bafy/dir/file"
-            blocks: Dict mapping CID -> block data from CAR response
-
-        Returns:
-            Final CID at the end of the path
+        from .dag import verify_merkle_path
+        return verify_merkle_path(path, blocks)
 
-        Raises:
-            FileNotFoundError: If path cannot be verified through the chain
+    @asynccontextmanager
+    async def iter_car(self, path, session, dag_scope="all", **car_options):
         """
-        segments = path.split("/")
-
-        # First segment must be the root CID
-        try:
-            current_cid = CID.decode(segments[0])
-        except Exception as e:
-            raise FileNotFoundError(f"Invalid root CID in path: {segments[0]}") from e
-
-        # Verify root block exists in CAR
-        if current_cid not in blocks:
-            raise FileNotFoundError(f"Root block {current_cid} not found in CAR response")
-
-        # Walk through path segments, validating each link
-        for segment in segments[1:]:
-            current_block = blocks[current_cid]
-
-            # Decode as PBNode to access links
-            if current_cid.codec != DagPbCodec:
-                raise FileNotFoundError(f"Cannot traverse path through non-DAG-PB block: {current_cid}")
-
-            node = unixfsv1.PBNode.loads(current_block)
-
-            # Find link matching this path segment
-            matching_link = None
-            for link in node.Links:
-                if link.Name == segment:
-                    matching_link = link
-                    break
+        Requests ``path`` as CAR with the given ``dag_scope``.
 
-            if matching_link is None:
-                raise FileNotFoundError(f"Path segment '{segment}' not found in directory {current_cid}")
-
-            # Decode the child CID from the link's Hash
-            try:
-                child_cid = CID.decode(matching_link.Hash)
-            except Exception as e:
-                raise FileNotFoundError(f"Invalid CID in link '{segment}'") from e
-
-            # Verify child block exists in CAR
-            if child_cid not in blocks:
-                raise FileNotFoundError(f"Child block {child_cid} for path segment '{segment}' not found in CAR response")
-
-            current_cid = child_cid
+        Yields an async iterator over the hash-verified ``(CID, block, location)``
+        tuples of the response. Additional ``car_options`` are passed on to
+        :func:`ipfsspec.car.aread_car`.
+        """
+        from .car import aread_car
+        res = await self.get(path, session, headers={"Accept": "application/vnd.ipld.car"}, params={"format": "car", "dag-scope": dag_scope})
+        async with res:
+            self._raise_not_found_for_status(res, path)
+            _, blocks = await aread_car(res.content, **car_options)  # roots should be ignored by https://specs.ipfs.tech/http-gateways/trustless-gateway/
+            yield blocks
 
-        return current_cid
+    async def path_blocks(self, path, session, block_cache=None, **car_options):
+        """
+        Fetches the blocks along ``path`` as verified CAR (``dag-scope=block``).
 
-    async def info(self, path, session):
-        res = await self.get(path, session, headers={"Accept": "application/vnd.ipld.car"}, params={"format": "car", "dag-scope": "block"})
-        self._raise_not_found_for_status(res, path)
+        If a ``block_cache`` is given, the blocks are stored in it as well.
 
-        resdata = await res.read()
+        Returns:
+            Dict mapping CID -> block data
+        """
+        async with self.iter_car(path, session, dag_scope="block", **car_options) as blocks:
+            path_blocks = {cid: data async for cid, data, _ in blocks}
+        if block_cache is not None:
+            for cid, data in path_blocks.items():
+                block_cache.put(cid, data)
+        return path_blocks
+
+    async def block(self, cid, session):
+        """
+        Fetches a single verified block (``format=raw``).
+        """
+        res = await self.get(str(cid), session, headers={"Accept": "application/vnd.ipld.raw"}, params={"format": "raw"})
+        async with res:
+            self._raise_not_found_for_status(res, str(cid))
+            data = await res.read()
+        if cid.hashfun.digest(data) != cid.digest:
+            from .car import VerificationError
+            raise VerificationError(f"Block '{cid}' from {self} could not be verified")
+        return data
 
-        _, blocks = read_car(resdata)  # roots should be ignored by https://specs.ipfs.tech/http-gateways/trustless-gateway/
-        blocks = {cid: data for cid, data, _ in blocks}
+    async def info(self, path, session, block_cache=None, **car_options):
+        from .dag import node_info
+        blocks = await self.path_blocks(path, session, block_cache=block_cache, **car_options)
 
         # Verify the merkle proof from root CID through path segments
         cid = self._verify_merkle_path(path, blocks)
-        block = blocks[cid]
-
-        if cid.codec == RawCodec:
-            return {
-                "name": path,
-                "CID": str(cid),
-                "type": "file",
-                "size": len(block),
-            }
-        elif cid.codec == DagPbCodec:
-
-            node = unixfsv1.PBNode.loads(block)
-            data = unixfsv1.Data.loads(node.Data)
-            if data.Type == unixfsv1.DataType.Raw:
-                raise FileNotFoundError(path)  # this is not a file, it's only a part of it
-            elif data.Type == unixfsv1.DataType.Directory:
-                return {
-                    "name": path,
-                    "CID": str(cid),
-                    "type": "directory",
-                    "islink": False,
-                }
-            elif data.Type == unixfsv1.DataType.File:
-                return {
-                    "name": path,
-                    "CID": str(cid),
-                    "type": "file",
-                    "size": data.filesize,
-                    "islink": False,
-                }
-            elif data.Type == unixfsv1.DataType.Metadata:
-                raise NotImplementedError(f"The path '{path}' contains a Metadata node, this is currently not implemented")
-            elif data.Type == unixfsv1.DataType.Symlink:
-                return {
-                    "name": path,
-                    "CID": str(cid),
-                    "type": "other",  # TODO: maybe we should have directory or file as returning type, but that probably would require resolving at least another level of blocks
-                    "islink": True,
-                }
-            elif data.Type == unixfsv1.DataType.HAMTShard:
-                raise NotImplementedError(f"The path '{path}' contains a HAMTSharded directory, this is currently not implemented")
-        else:
-            raise FileNotFoundError(path)  # it exists, but is not a UNIXFSv1 object, so it's not a file
-
-    async def cat(self, path, session):
-        res = await self.get(path, session)
-        async with res:
-            self._raise_not_found_for_status(res, path)
-            return await res.read()
+        return node_info(path, cid, blocks[cid])
 
     @asynccontextmanager
-    async def iter_chunked(self, path, session, chunk_size):
-        res = await self.get(path, session)
-        async with res:
-            self._raise_not_found_for_status(res, path)
-            try:
-                size = int(res.headers["content-length"])
-            except (ValueError, KeyError):
-                size = None
-            yield size, res.content.iter_chunked(chunk_size)
+    async def iter_dag(self, path, session, **car_options):
+        """
+        Streams the complete DAG below ``path`` as CAR (``dag-scope=all``).
 
-    async def ls(self, path, session, detail=False):
-        res = await self.get(path, session, headers={"Accept": "application/vnd.ipld.car"}, params={"format": "car", "dag-scope": "block"})
-        self._raise_not_found_for_status(res, path)
+        Yields an async iterator over the verified ``(CID, block)`` pairs of
+        the DAG, starting with the block of the path target. The iterator
+        raises if the gateway sends blocks which are not part of the DAG or
+        if the DAG is incomplete.
+        """
+        async with self.iter_car(path, session, dag_scope="all", **car_options) as blocks:
+            yield self._verified_subtree(path, blocks)
 
-        resdata = await res.read()
+    @staticmethod
+    async def _verified_subtree(path, blocks):
+        from .dag import SubtreeVerifier
+        verifier = SubtreeVerifier(path)
+        async for cid, data, _ in blocks:
+            if verifier.add(cid, data):
+                yield cid, data
+        verifier.finish()
+
+    async def resolve(self, name, session):
+        """
+        Resolves an IPNS name to a content path (e.g. ``/ipfs/<CID>``) and its TTL in seconds.
 
-        _, blocks = read_car(resdata)  # roots should be ignored by https://specs.ipfs.tech/http-gateways/trustless-gateway/
-        blocks = {cid: data for cid, data, _ in blocks}
+        Names with a signed IPNS record are resolved using ``format=ipns-record``,
+        the signature of the record is not verified. Other names (e.g. DNSLink)
+        are resolved by requesting the blocks along the name, the last one
+        of these is the resolved content.
+        """
+        from .car import aread_car
+        from .ipns import parse_ipns_record
+        res = await self.get(name, session, headers={"Accept": "application/vnd.ipfs.ipns-record"}, params={"format": "ipns-record"})
+        async with res:
+            if res.status == 200 and res.content_type == "application/vnd.ipfs.ipns-record":
+                return parse_ipns_record(await res.read())
+
+        res = await self.get(name, session, headers={"Accept": "application/vnd.ipld.car"}, params={"format": "car", "dag-scope": "block"})
+        async with res:
+            self._raise_not_found_for_status(res, name)
+            ttl = _max_age(res.headers.get("Cache-Control", ""))
+            _, blocks = await aread_car(res.content)
+            target = None
+            async for cid, _, _ in blocks:
+                target = cid
+        if target is None:
+            raise FileNotFoundError(name)
+        return "/ipfs/" + str(target), ttl
+
+    async def ls(self, path, session, detail=False, block_cache=None, **car_options):
+        from .dag import directory_links
+        blocks = await self.path_blocks(path, session, block_cache=block_cache, **car_options)
 
         # Verify the chain of custody from root CID through path segments
         cid = self._verify_merkle_path(path, blocks)
-
-        if cid.codec != DagPbCodec:
-            raise NotADirectoryError(f"Path {path} does not resolve to a directory")
-
-        node = unixfsv1.PBNode.loads(blocks[cid])
-        data = unixfsv1.Data.loads(node.Data)
-        if data.Type != unixfsv1.DataType.Directory:
-            # TODO: we might need support for HAMTShard here (for large directories)
-            raise NotADirectoryError(path)
+        links = directory_links(path, cid, blocks[cid])
 
         if detail:
             return await asyncio.gather(*(
-                self.info(path + "/" + link.Name, session)
-                for link in node.Links))
+                self.info(path + "/" + link.Name, session, block_cache=block_cache, **car_options)
+                for link in links))
         else:
-            return [path + "/" + link.Name for link in node.Links]
+            return [path + "/" + link.Name for link in links]
 
     def _raise_not_found_for_status(self, response, url):
         """
@@ -245,14 +233,147 @@ class AsyncIPFSGateway:
         response.raise_for_status()
 
 
-async def get_client(**kwargs):
+def _max_age(cache_control):
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return float(match.group(1)) if match else None
+
+
+async def get_client(limit=100, limit_per_host=32, keepalive_timeout=60.0, ttl_dns_cache=300,
+                     connect_timeout=30.0, read_timeout=60.0, total_timeout=None, unix_socket=None,
+                     retry_attempts=5, **kwargs):
+    """
+    Creates a retrying HTTP client with a tuned connection pool.
+
+    aiohttp enables TCP_NODELAY on all of its connections.
+
+    Parameters
+    ----------
+    limit, limit_per_host: int
+        Maximum number of concurrent connections in total and per gateway (0 means unlimited)
+    keepalive_timeout: float
+        Seconds to keep idle connections open for reuse
+    ttl_dns_cache: int
+        Seconds to cache DNS lookups, ``None`` caches them forever
+    connect_timeout: float
+        Timeout for establishing a connection
+    read_timeout: float
+        Timeout for the first byte of a response and between subsequent reads
+    total_timeout: float
+        Timeout for a complete request, including reading the response
+    unix_socket: str, optional
+        Connect to this Unix domain socket instead of using TCP
+    retry_attempts: int
+        Attempts per request before giving up on connection errors and timeouts,
+        failed requests are started over on the same gateway. Filesystems with
+        several gateways default to :data:`MULTI_GATEWAY_RETRY_ATTEMPTS`.
+    kwargs:
+        Passed on to :class:`aiohttp.ClientSession`, e.g. ``headers`` or ``trace_configs``
+    """
+    import aiohttp
+    import aiohttp_retry
     retry_options = aiohttp_retry.ExponentialRetry(
-            attempts=5,
+            attempts=retry_attempts,
             exceptions={OSError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError})
-    retry_client = aiohttp_retry.RetryClient(raise_for_status=False, retry_options=retry_options)
+    if unix_socket is not None:
+        connector = aiohttp.UnixConnector(path=unix_socket, limit=limit, limit_per_host=limit_per_host,
+                                          keepalive_timeout=keepalive_timeout)
+    else:
+        connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout,
+                                         use_dns_cache=True, ttl_dns_cache=ttl_dns_cache)
+    timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout, sock_read=read_timeout)
+    retry_client = aiohttp_retry.RetryClient(raise_for_status=False, retry_options=retry_options,
+                                             connector=connector, timeout=timeout, **kwargs)
     return retry_client
 
 
+def _client_session(client):
+    """
+    :class:`aiohttp.ClientSession` used by ``client``, which may be wrapped by a ``RetryClient``.
+    """
+    return getattr(client, "_client", client)
+
+
+# loop -> {kwargs: client}, entries are removed when the loop shuts down
+_shared_clients = {}
+# loop -> async generator closing the clients of the loop at its shutdown
+_shutdown_hooks = {}
+# hooks inherited across fork must neither be finalized nor closed
+_inherited_hooks = []
+
+
+async def _close_at_shutdown(loop):
+    """
+    Closes the shared clients of ``loop`` once the loop shuts down its async generators.
+
+    ``asyncio.run`` does so before closing the loop, which drops the clients
+    while they can still be closed cleanly.
+    """
+    try:
+        yield
+    finally:
+        _shutdown_hooks.pop(loop, None)
+        for client in _shared_clients.pop(loop, {}).values():
+            await client.close()
+
+
+def _drop_closed_loops():
+    """
+    Drops the clients of loops closed without shutting down their async generators.
+    """
+    for loop in [loop for loop in _shared_clients if loop.is_closed()]:
+        _shutdown_hooks.pop(loop, None)
+        for client in _shared_clients.pop(loop).values():
+            AsyncIPFSFileSystem.close_session(None, client)
+
+
+async def get_shared_client(**kwargs):
+    """
+    Client for the running event loop, which is shared by all callers using the same ``kwargs``.
+
+    See :func:`get_client` for the parameters. Shared clients are closed when
+    the loop shuts down (e.g. at the end of ``asyncio.run``) or at interpreter exit.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _shared_clients.get(loop)
+    if clients is None:
+        _drop_closed_loops()
+        clients = _shared_clients[loop] = {}
+        hook = _shutdown_hooks[loop] = _close_at_shutdown(loop)
+        await hook.__anext__()
+    key = repr(sorted(kwargs.items()))
+    client = clients.get(key)
+    if client is None or _client_session(client).closed:
+        client = clients[key] = await get_client(**kwargs)
+    return client
+
+
+def _forget_inherited_clients():
+    """
+    Drops the shared clients after ``fork`` without closing them.
+
+    Their connections belong to the parent process, closing them in the
+    child could interfere with the parent (e.g. by sending TLS close_notify).
+    """
+    for clients in _shared_clients.values():
+        for client in clients.values():
+            session = _client_session(client)
+            if session.connector is not None:
+                session.connector._conns.clear()
+                session._connector = None
+    _shared_clients.clear()
+    _inherited_hooks.extend(_shutdown_hooks.values())
+    _shutdown_hooks.clear()
+    get_gateway.cache_clear()
+
+
+@atexit.register
+def _close_shared_clients():
+    for loop, clients in list(_shared_clients.items()):
+        for client in clients.values():
+            if not _client_session(client).closed:
+                AsyncIPFSFileSystem.close_session(loop, client)
+
+
 def gateway_from_file(gateway_path, protocol="ipfs"):
     if gateway_path.exists():
         with open(gateway_path) as gw_file:
@@ -262,6 +383,15 @@ def gateway_from_file(gateway_path, protocol="ipfs"):
     return None
 
 
+def get_gateways(protocol="ipfs", gateway_addr=None):
+    """
+    Gateways for ``gateway_addr``, which may be a single address or a list of addresses.
+    """
+    if isinstance(gateway_addr, (list, tuple)):
+        return [get_gateway(protocol, gateway_addr=addr) for addr in gateway_addr]
+    return [get_gateway(protocol, gateway_addr=gateway_addr)]
+
+
 @lru_cache
 def get_gateway(protocol="ipfs", gateway_addr=None):
     """
@@ -346,24 +476,270 @@ def get_gateway(protocol="ipfs", gateway_addr=None):
                        "severe performance issues.")
 
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited_clients)
+
+
+class Prefetch:
+    """
+    Handle of a background prefetch started by :meth:`AsyncIPFSFileSystem.prefetch`.
+
+    The attributes report the progress: ``completed`` paths out of ``paths``,
+    ``blocks`` and ``bytes`` stored in the block cache and ``errors`` by path.
+    Async code can ``await`` the handle, sync code can call :meth:`wait`.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.completed = 0
+        self.blocks = 0
+        self.bytes = 0
+        self.errors = {}
+        self._future = None
+
+    @property
+    def progress(self):
+        return self.completed / len(self.paths) if self.paths else 1.0
+
+    def done(self):
+        return self._future.done()
+
+    def cancel(self):
+        if isinstance(self._future, concurrent.futures.Future):
+            self._future.cancel()
+        else:
+            self._future.get_loop().call_soon_threadsafe(self._future.cancel)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the prefetch has finished, must not be called from within the filesystem's loop.
+        """
+        if not isinstance(self._future, concurrent.futures.Future):
+            raise RuntimeError("await the handle of prefetches started from within the event loop")
+        self._future.result(timeout)
+        return self
+
+    def __await__(self):
+        yield from asyncio.wrap_future(self._future).__await__()
+        return self
+
+
+class _FileReader:
+    """
+    Reads a byte range of a UnixFS file, streaming the blocks missing from the block cache.
+
+    On a miss, the subtree of the highest node above the missing block which
+    is needed for at least half of its contents (and whose ancestors down to
+    the block are as well) is streamed with a single request, so reading a
+    file which isn't cached takes one request. Blocks needed for less than
+    half are fetched on their own. Only blocks within the range are kept,
+    until the traversal reaches them, and none is added to the block cache.
+    Once a stream failed, the following ones start at the missing blocks,
+    such that the next gateway doesn't send the blocks read before again.
+    """
+
+    def __init__(self, fs):
+        self.fs = fs
+        self.wanted = set()
+        self.received = {}
+        self.gateway = None
+        self.root = None
+        self.failed = False
+        self._blocks = None
+        self._response = None
+
+    async def iter_range(self, cid, start, end, size, anchor=None):
+        """
+        Yields the pieces of the bytes ``start:end`` of the file ``cid`` of ``size`` bytes.
+
+        ``anchor`` is the topmost of the nodes above ``cid`` which are needed for at least half of their contents.
+        """
+        from .dag import file_layout
+        anchor = (anchor or cid) if 2 * (end - start) >= size else None
+        inline, children = file_layout(cid, await self.get_block(cid, anchor))
+        children = [(offset, child_size, child) for offset, child_size, child in children
+                    if offset < end and offset + child_size > start]
+        self.wanted.update(bytes(child.digest) for _, _, child in children)
+        if start < len(inline):
+            yield memoryview(inline)[start:min(end, len(inline))]
+        for offset, child_size, child in children:
+            async for piece in self.iter_range(child, max(start - offset, 0), min(end - offset, child_size),
+                                               child_size, anchor):
+                yield piece
+
+    async def get_block(self, cid, anchor):
+        key = bytes(cid.digest)
+        self.wanted.discard(key)
+        data = self.received.pop(key, None)
+        if data is None:
+            data = self.fs.block_cache.get(cid)
+        if data is None:
+            data = await self.fs._failover(lambda gateway, session, _: self._read_until(cid, anchor, gateway, session))
+        return data
+
+    async def _read_until(self, cid, anchor, gateway, session):
+        from .car import VerificationError
+        if self.failed and anchor is not None:
+            anchor = cid
+        try:
+            streamed = None
+            if self._blocks is not None and self.gateway is gateway:
+                streamed = self.root
+                data = await self._next(cid)
+                if data is not None:
+                    return data
+            # streams which ended without the block aren't requested again
+            for root in dict.fromkeys([anchor or cid, cid]):
+                if root != streamed:
+                    await self._open(root, "all" if anchor is not None else "block", gateway, session)
+                    data = await self._next(cid)
+                    if data is not None:
+                        return data
+            raise VerificationError(f"{gateway} didn't send block {cid}")
+        except BaseException:
+            self.failed = True
+            await self.close()
+            raise
+
+    async def _open(self, root, dag_scope, gateway, session):
+        await self.close()
+        response = gateway.iter_car(str(root), session, dag_scope=dag_scope, **self.fs.car_options)
+        self._blocks = await response.__aenter__()
+        self._response = response
+        self.gateway = gateway
+        self.root = root
+
+    async def _next(self, cid):
+        """
+        Reads the current stream up to block ``cid``, keeping wanted blocks. Returns ``None`` if it ends before.
+        """
+        digest = bytes(cid.digest)
+        async for block_cid, data, _ in self._blocks:
+            key = bytes(block_cid.digest)
+            if key == digest:
+                return data
+            if key in self.wanted:
+                self.received[key] = data
+        await self.close()
+        return None
+
+    async def close(self):
+        response, blocks = self._response, self._blocks
+        self._response = self._blocks = None
+        if blocks is not None:
+            await blocks.aclose()
+        if response is not None:
+            await response.__aexit__(None, None, None)
+
+
 class AsyncIPFSFileSystem(AsyncFileSystem):
     sep = "/"
     protocol = "ipfs"
 
-    def __init__(self, asynchronous=False, loop=None, client_kwargs=None, gateway_addr=None, **storage_options):
+    def __init__(self, asynchronous=False, loop=None, client_kwargs=None, gateway_addr=None,
+                 hash_workers=None, hash_threshold=None, metadata_cache=None, block_cache=None,
+                 readahead_bytes=None, quarantine_seconds=60, **storage_options):
+        """
+        Parameters
+        ----------
+        client_kwargs: dict, optional
+            Connection pool settings and session options, see :func:`get_client`.
+            Instances on the same event loop with equal ``client_kwargs`` share a session.
+        gateway_addr: str or list of str, optional
+            Gateway to use, defaults to the one configured according to IPIP-280.
+            If several gateways are given, requests which fail on one gateway
+            continue on the next one, instead of being retried on the same
+            gateway (unless ``retry_attempts`` is set in ``client_kwargs``).
+        hash_workers: int, optional
+            If given, blocks of at least ``hash_threshold`` bytes are verified on
+            a thread pool of this size instead of on the event loop thread.
+        hash_threshold: int
+            Minimum block size for verification on the thread pool, defaults
+            to :data:`ipfsspec.car.HASH_THRESHOLD`.
+        metadata_cache: str, optional
+            Path of a SQLite database which persists ``info`` and ``ls``
+            results. It's consulted before the gateway and can be shared
+            by multiple processes.
+        block_cache: optional
+            Cache of verified blocks (see :mod:`ipfsspec.blockcache`) which
+            file contents are read from, defaults to a
+            :class:`ipfsspec.blockcache.MemoryBlockCache`.
+        readahead_bytes: int
+            Maximum number of bytes each file returned by ``open`` fetches ahead
+            of sequential reads, defaults to :data:`ipfsspec.readahead.READAHEAD_BYTES`.
+        quarantine_seconds: float
+            Gateways which send unverifiable data, fail or stall are only used
+            as a last resort for this long.
+        """
         super().__init__(self, asynchronous=asynchronous, loop=loop, **storage_options)
-        self._session = None
+        self._sessions = {}
 
         self.client_kwargs = client_kwargs or {}
-        self.get_client = get_client
+        self.get_client = get_shared_client
         self.gateway_addr = gateway_addr
+        self.metadata = None
+        if metadata_cache is not None:
+            from .metadata import MetadataStore
+            self.metadata = MetadataStore(metadata_cache)
+        self._block_cache = block_cache
+        self._block_fetches = {}
+        self.readahead_bytes = readahead_bytes
+        self.quarantine_seconds = quarantine_seconds
+
+        self.hash_workers = hash_workers
+        self.car_options = {"hash_threshold": hash_threshold} if hash_threshold is not None else {}
+        self._start_hash_workers()
+
+    def _start_hash_workers(self):
+        if self.hash_workers:
+            executor = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="ipfsspec-hash")
+            weakref.finalize(self, executor.shutdown, wait=False)
+            self.car_options["executor"] = executor
+
+    def __reduce__(self):
+        # event loops can't be pickled, the unpickled instance uses the loop of its process
+        storage_options = {key: value for key, value in self.storage_options.items() if key != "loop"}
+        return make_instance, (type(self), self.storage_args, storage_options)
+
+    @property
+    def loop(self):
+        self._check_fork()
+        return self._loop
+
+    def _check_fork(self):
+        """
+        Drops state inherited from a parent process, it's recreated lazily.
+
+        Sessions, pending requests and hash workers of the parent can't be
+        used after ``fork``, caches of verified data are kept.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        if not self.asynchronous:
+            self._loop = get_loop()
+        self._sessions = {}
+        self._block_fetches = {}
+        self._start_hash_workers()
 
-        if not asynchronous:
-            sync(self.loop, self.set_session)
+    @property
+    def gateways(self):
+        return get_gateways(self.protocol, gateway_addr=self.gateway_addr)
 
     @property
     def gateway(self):
-        return get_gateway(self.protocol, gateway_addr=self.gateway_addr)
+        """
+        First of the configured gateways which isn't quarantined.
+        """
+        gateways = self.gateways
+        return next((gateway for gateway in gateways if gateway.available), gateways[0])
+
+    @property
+    def block_cache(self):
+        if self._block_cache is None:
+            from .blockcache import MemoryBlockCache
+            self._block_cache = MemoryBlockCache()
+        return self._block_cache
 
     @staticmethod
     def close_session(loop, session):
@@ -373,66 +749,583 @@ class AsyncIPFSFileSystem(AsyncFileSystem):
                 return
             except (TimeoutError, FSTimeoutError):
                 pass
-        if session._connector is not None:
+        connector = _client_session(session).connector
+        if connector is not None:
             # close after loop is dead
-            session._connector._close()
+            connector._close()
+
+    async def set_session(self, gateway=None):
+        """
+        Session for requests to ``gateway`` (defaults to :attr:`gateway`) on the running event loop.
+        """
+        self._check_fork()
+        loop = asyncio.get_running_loop()
+        unix_socket = (gateway or self.gateway).unix_socket
+        session = self._sessions.get((loop, unix_socket))
+        if session is None or _client_session(session).closed:
+            # shared sessions are closed along with their loop, which may be used again by cached instances
+            self._sessions = {key: value for key, value in self._sessions.items() if not key[0].is_closed()}
+            client_kwargs = self.client_kwargs
+            if len(self.gateways) > 1:
+                # failed requests continue on the next gateway rather than starting over on the same one
+                client_kwargs = {"retry_attempts": MULTI_GATEWAY_RETRY_ATTEMPTS, **client_kwargs}
+            if unix_socket is not None:
+                client_kwargs = {**client_kwargs, "unix_socket": unix_socket}
+            session = self._sessions[loop, unix_socket] = await self.get_client(**client_kwargs)
+        return session
+
+    async def _failover(self, request, gateways=None):
+        """
+        Runs ``request(gateway, session, attempt)`` on the configured ``gateways`` until one succeeds.
+
+        Gateways are tried in order, quarantined ones last. If a gateway sends
+        unverifiable data, fails or stalls, it's quarantined and the request
+        continues on the next gateway, ``attempt`` counts the gateways tried
+        before. Blocks verified up to that point are kept in the block cache,
+        so requests can skip them on later attempts. Content which isn't found
+        is looked up on the next gateway as well, but isn't a reason for
+        quarantine. The error of the last gateway is raised if all of them fail.
+        """
+        from aiohttp import ClientError
+        from .car import TruncatedCARError, VerificationError
+        gateways = gateways or self.gateways
+        gateways = [gw for gw in gateways if gw.available] + [gw for gw in gateways if not gw.available]
+        for attempt, gateway in enumerate(gateways):
+            last = attempt == len(gateways) - 1
+            try:
+                return await request(gateway, await self.set_session(gateway), attempt)
+            except FileNotFoundError:
+                if last:
+                    raise
+            except (VerificationError, TruncatedCARError, asyncio.IncompleteReadError, ClientError, asyncio.TimeoutError,
+                    ConnectionError, RequestsTooQuick) as e:
+                gateway.quarantine(self.quarantine_seconds)
+                if last:
+                    raise
+                logger.warning("%s failed, quarantined for %ss and continuing on the next gateway: %r",
+                               gateway, self.quarantine_seconds, e)
+
+    async def _resolve_path(self, path):
+        """
+        Path to request from the gateway in order to access ``path``.
+        """
+        return path
+
+    @staticmethod
+    def _rename(result, resolved, path):
+        """
+        Maps names in results for the resolved path back to the requested path.
+        """
+        if resolved == path:
+            return result
+        if isinstance(result, list):
+            return [AsyncIPFSFileSystem._rename(entry, resolved, path) for entry in result]
+        if isinstance(result, dict):
+            return {**result, "name": path + result["name"][len(resolved):]}
+        return path + result[len(resolved):]
+
+    def _info_from_dircache(self, resolved):
+        """
+        Looks up the info of ``resolved`` in the dircache listing of its parent.
 
-    async def set_session(self):
-        if self._session is None:
-            self._session = await self.get_client(loop=self.loop, **self.client_kwargs)
-            if not self.asynchronous:
-                weakref.finalize(self, self.close_session, self.loop, self._session)
-        return self._session
+        Returns ``None`` if the parent hasn't been listed yet. As ``/ipfs``
+        paths are immutable, listings never expire and missing entries
+        don't exist.
+        """
+        parent, sep, _ = resolved.rpartition("/")
+        if not sep or parent not in self.dircache:
+            return None
+        for entry in self.dircache[parent]:
+            if entry["name"] == resolved:
+                return entry
+        raise FileNotFoundError(resolved)
 
     async def _ls(self, path, detail=True, **kwargs):
         path = self._strip_protocol(path)
-        session = await self.set_session()
-        return await self.gateway.ls(path, session, detail=detail)
+        resolved = await self._resolve_path(path)
+        if resolved in self.dircache:
+            listing = self.dircache[resolved]
+            return self._rename(listing if detail else [entry["name"] for entry in listing], resolved, path)
+        if self.metadata is not None and (listing := self.metadata.get_listing(resolved, detail)) is not None:
+            if detail:
+                self.dircache[resolved] = listing
+            return self._rename(listing, resolved, path)
+        listing = await self._failover(
+            lambda gateway, session, _: gateway.ls(resolved, session, detail=detail, block_cache=self.block_cache,
+                                                   **self.car_options))
+        if detail:
+            self.dircache[resolved] = listing
+        if self.metadata is not None:
+            self.metadata.put_listing(resolved, listing)
+        return self._rename(listing, resolved, path)
 
     ls = sync_wrapper(_ls)
 
+    async def _block(self, cid, size=None):
+        """
+        Verified block ``cid``, read from the block cache if possible.
+
+        On a miss, the whole subtree below ``cid`` is fetched with a single
+        request if the ``size`` of its file contents is known to be small
+        enough, otherwise only the block itself is fetched. Concurrent misses
+        of the same block share a single request.
+        """
+        data = self.block_cache.get(cid)
+        if data is not None:
+            return data
+        key = bytes(cid.digest)
+        fetch = self._block_fetches.get(key)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_block(cid, size))
+            self._block_fetches[key] = fetch
+            fetch.add_done_callback(lambda _: self._block_fetches.pop(key, None))
+        return await asyncio.shield(fetch)
+
+    @property
+    def _fill_bytes(self):
+        """
+        Maximum size of the file contents below a block which are fetched along with it.
+        """
+        return min(SUBTREE_FILL_BYTES, getattr(self.block_cache, "max_bytes", SUBTREE_FILL_BYTES) // 4)
+
+    async def _fetch_block(self, cid, size):
+        fill_bytes = self._fill_bytes
+
+        async def fetch(gateway, session, attempt):
+            if attempt:
+                # the subtree may have been interrupted after this block, missing
+                # children are fetched when they are read
+                data = self.block_cache.get(cid)
+                if data is not None:
+                    return data
+            elif size is not None and size <= fill_bytes:
+                data = None
+                async with gateway.iter_car(str(cid), session, dag_scope="all", **self.car_options) as blocks:
+                    async for block_cid, block, _ in blocks:
+                        self.block_cache.put(block_cid, block)
+                        if block_cid.digest == cid.digest:
+                            data = block
+                if data is not None:
+                    return data
+            data = await gateway.block(cid, session)
+            self.block_cache.put(cid, data)
+            return data
+
+        return await self._failover(fetch)
+
+    async def _file_range(self, path, start=None, end=None, info=None):
+        """
+        CID and normalized range of the file at ``path``, whose ``info`` is looked up unless given.
+        """
+        from multiformats import CID
+        if info is None:
+            info = await self._info(path)
+        if info["type"] != "file":
+            raise IsADirectoryError(path)
+        size = info["size"]
+        start = 0 if start is None else start if start >= 0 else max(size + start, 0)
+        end = size if end is None else min(end if end >= 0 else size + end, size)
+        return CID.decode(info["CID"]), size, start, end
+
+    async def _iter_file(self, path, start=None, end=None, info=None):
+        """
+        Yields verified pieces of the contents of the file at ``path`` (with ``info``, if already known).
+
+        Cached blocks are used, missing ones are streamed (see :class:`_FileReader`)
+        without filling the block cache.
+        """
+        cid, size, start, end = await self._file_range(path, start, end, info)
+        if start < end:
+            reader = _FileReader(self)
+            try:
+                async for piece in reader.iter_range(cid, start, end, size):
+                    yield piece
+            finally:
+                await reader.close()
+
     async def _cat_file(self, path, start=None, end=None, **kwargs):
-        path = self._strip_protocol(path)
-        session = await self.set_session()
-        return (await self.gateway.cat(path, session))[start:end]
+        return b"".join([piece async for piece in self._iter_file(path, start, end)])
 
     async def _get_file(
-        self, rpath, lpath, chunk_size=5 * 2**20, callback=DEFAULT_CALLBACK, **kwargs
+        self, rpath, lpath, chunk_size=5 * 2**20, callback=DEFAULT_CALLBACK, skip_identical=False, **kwargs
     ):
+        """
+        Downloads the file at ``rpath`` to ``lpath``, writing chunks of at least ``chunk_size`` bytes.
+
+        If ``skip_identical`` is set and ``lpath`` already exists with the
+        UnixFS CID of ``rpath``, it's left as is (see :meth:`_is_identical`).
+        """
         logger.debug(rpath)
-        rpath = self._strip_protocol(rpath)
+        info = await self._info(rpath)
+        if info["type"] == "directory":
+            # recursive gets include the directories themselves
+            if not isfilelike(lpath):
+                os.makedirs(lpath, exist_ok=True)
+            return
+        callback.set_size(info["size"])
+        if skip_identical and not isfilelike(lpath) and await self._is_identical(info, lpath):
+            logger.debug("%s is identical to %s, skipping download", lpath, rpath)
+            callback.relative_update(info["size"])
+            return
+
+        if isfilelike(lpath):
+            outfile = lpath
+        else:
+            outfile = open(lpath, "wb")  # noqa: ASYNC101, ASYNC230
+
+        def write(pieces):
+            chunk = b"".join(pieces)
+            outfile.write(chunk)
+            callback.relative_update(len(chunk))
+
+        try:
+            pieces, buffered = [], 0
+            async for piece in self._iter_file(rpath, info=info):
+                pieces.append(piece)
+                buffered += len(piece)
+                if buffered >= chunk_size:
+                    write(pieces)
+                    pieces, buffered = [], 0
+            write(pieces)
+        finally:
+            if not isfilelike(lpath):
+                outfile.close()
+
+    async def _is_identical(self, info, lpath):
+        """
+        Checks whether the local file ``lpath`` has the same contents as the remote file ``info``.
+
+        The local file is chunked and hashed the way the remote DAG was built,
+        which is inferred from its root (and leftmost interior) blocks, so no
+        file contents are transferred. Chunks are hashed on the hash workers
+        if configured, otherwise on the default executor of the loop.
+        """
+        from multiformats import CID
+        from .importer import afile_cid, infer_layout
+        try:
+            if os.path.getsize(lpath) != info["size"]:
+                return False
+        except OSError:
+            return False
+
+        cid = CID.decode(info["CID"])
+        # only request the blocks themselves, not the subtrees below them
+        layout = await infer_layout(lambda block_cid, _: self._block(block_cid), cid, info["size"])
+        if layout is None:
+            return False
+        loop = asyncio.get_running_loop()
+        executor = self.car_options.get("executor")
+        local_cid = await afile_cid(lpath, info["size"], layout,
+                                    run=lambda func, *args: loop.run_in_executor(executor, func, *args))
+        return bytes(local_cid) == bytes(cid)
+
+    def prefetch(self, paths, recursive=True, max_bytes=None, max_concurrency=4):
+        """
+        Fetches the blocks below ``paths`` into the block cache in the background.
+
+        Each path is fetched with a single request, at most ``max_concurrency``
+        requests are made at once. Fetching stops once ``max_bytes`` have been
+        fetched. If ``recursive`` is false, directories are not descended into.
+
+        Returns a :class:`Prefetch` handle immediately. Asynchronous
+        filesystems must call this from within their running event loop.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        handle = Prefetch(paths)
+        coro = self._prefetch(handle, recursive, max_bytes, max_concurrency)
+        if self.asynchronous:
+            handle._future = asyncio.ensure_future(coro)
+        else:
+            handle._future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return handle
+
+    async def _prefetch(self, handle, recursive, max_bytes, max_concurrency):
+        semaphore = asyncio.Semaphore(max_concurrency)
+        dag_scope = "all" if recursive else "entity"
+
+        async def fetch(resolved, gateway, session, attempt):
+            roots = [resolved]
+            if attempt:
+                # only ask for what the previous gateways didn't deliver
+                from multiformats import CID
+                root = CID.decode((await self._info(resolved))["CID"])
+                roots = [str(cid) for cid in self._missing_subtrees(root)] if recursive else [str(root)]
+            for root in roots:
+                async with gateway.iter_car(root, session, dag_scope=dag_scope, **self.car_options) as blocks:
+                    async for cid, data, _ in blocks:
+                        if max_bytes is not None and handle.bytes >= max_bytes:
+                            return
+                        self.block_cache.put(cid, data)
+                        handle.blocks += 1
+                        handle.bytes += len(data)
+
+        async def prefetch_path(path):
+            async with semaphore:
+                try:
+                    resolved = await self._resolve_path(self._strip_protocol(path))
+                    await self._failover(lambda gateway, session, attempt: fetch(resolved, gateway, session, attempt))
+                except Exception as e:
+                    logger.debug("prefetching %s failed: %s", path, e)
+                    handle.errors[path] = e
+                finally:
+                    handle.completed += 1
+
+        await asyncio.gather(*(prefetch_path(path) for path in handle.paths))
+        return handle
+
+    def _missing_subtrees(self, cid):
+        """
+        Roots of the largest subtrees below ``cid`` which are missing from the block cache.
+        """
+        from .dag import links
+        missing = []
+        stack = [cid]
+        while stack:
+            cid = stack.pop()
+            data = self.block_cache.get(cid)
+            if data is None:
+                missing.append(cid)
+            else:
+                stack.extend(reversed(links(cid, data)))
+        return missing
+
+    async def _export_car(self, path, lpath, write_index=False, callback=DEFAULT_CALLBACK, **kwargs):
+        """
+        Exports the complete DAG below ``path`` into the local CAR file ``lpath``.
+
+        The DAG is fetched with a single request and each block is verified
+        and written as soon as it's received, so only a single block has to
+        be kept in memory. If ``write_index`` is set, a CARv2 index
+        (``MultihashIndexSorted``) is written to ``<lpath>.idx``, such that
+        the CAR can be used by :class:`ipfsspec.CARFileSystem` right away.
+        """
+        from .car import write_car_header, write_car_block, CARIndex
+        path = await self._resolve_path(self._strip_protocol(path))
         session = await self.set_session()
 
         if isfilelike(lpath):
+            if write_index:
+                raise ValueError("an index can only be written if lpath is a path")
             outfile = lpath
         else:
             outfile = open(lpath, "wb")  # noqa: ASYNC101, ASYNC230
 
+        entries = []
+        offset = 0
         try:
-            async with self.gateway.iter_chunked(rpath, session, chunk_size) as (size, chunks):
-                callback.set_size(size)
-                async for chunk in chunks:
-                    outfile.write(chunk)
-                    callback.relative_update(len(chunk))
+            async with self.gateway.iter_dag(path, session, **self.car_options) as blocks:
+                async for cid, data in blocks:
+                    if offset == 0:
+                        offset = write_car_header(outfile, [cid])
+                    if write_index:
+                        entries.append((cid, offset))
+                    offset += write_car_block(outfile, cid, data)
+                    callback.relative_update(len(data))
+        except BaseException:
+            if not isfilelike(lpath):
+                outfile.close()
+                os.unlink(lpath)
+            raise
         finally:
             if not isfilelike(lpath):
                 outfile.close()
 
+        if write_index:
+            with open(os.fspath(lpath) + ".idx", "wb") as index_file:  # noqa: ASYNC101, ASYNC230
+                CARIndex.from_entries(entries).dump(index_file)
+
+    export_car = sync_wrapper(_export_car)
+
     async def _info(self, path, **kwargs):
         path = self._strip_protocol(path)
-        session = await self.set_session()
-        return await self.gateway.info(path, session)
+        resolved = await self._resolve_path(path)
+        if (info := self._info_from_dircache(resolved)) is not None:
+            return self._rename(info, resolved, path)
+        if self.metadata is not None and (info := self.metadata.get_info(resolved)) is not None:
+            return self._rename(info, resolved, path)
+        info = await self._failover(
+            lambda gateway, session, _: gateway.info(resolved, session, block_cache=self.block_cache, **self.car_options))
+        if self.metadata is not None:
+            self.metadata.put_info(resolved, info)
+        return self._rename(info, resolved, path)
+
+    async def _isdir(self, path):
+        path = self._strip_protocol(path)
+        try:
+            if await self._resolve_path(path) in self.dircache:
+                return True
+        except OSError:
+            return False
+        return await super()._isdir(path)
+
+    def _readahead(self, info, readahead_bytes=None):
+        from multiformats import CID
+        from .readahead import ReadAhead
+        if readahead_bytes is None:
+            readahead_bytes = self.readahead_bytes
+        options = {"max_bytes": readahead_bytes} if readahead_bytes is not None else {}
+        return ReadAhead(self._block, CID.decode(info["CID"]), info["size"], **options)
+
+    async def open_async(self, path, mode="rb", readahead_bytes=None, **kwargs):
+        """
+        Opens the file at ``path`` as :class:`AsyncIPFSStreamedFile`.
 
-    def open(self, path, mode="rb", block_size=None, cache_options=None, **kwargs):
+        Verified blocks are streamed from the gateway, only the read-ahead
+        (bounded by ``readahead_bytes``) is kept in memory.
+        """
         if mode != "rb":
             raise NotImplementedError("opening modes other than read binary are not implemented")
-        data = self.cat_file(path)  # load whole chunk into memory
-        return io.BytesIO(data)
+        path = self._strip_protocol(path)
+        info = await self._info(path)
+        if info["type"] != "file":
+            raise IsADirectoryError(path)
+        return AsyncIPFSStreamedFile(self, path, info, mode, readahead_bytes=readahead_bytes, **kwargs)
+
+    def _open(self, path, mode="rb", block_size="default", autocommit=True, cache_options=None, **kwargs):
+        if mode != "rb":
+            raise NotImplementedError("opening modes other than read binary are not implemented")
+        return IPFSBufferedFile(self, path, mode, block_size, cache_options=cache_options, **kwargs)
 
     def ukey(self, path):
         """returns the CID, which is by definition an unchanging identitifer"""
         return self.info(path)["CID"]
 
 
+class IPFSBufferedFile(AbstractBufferedFile):
+    """
+    Read-only file which fetches verified blocks ahead of sequential reads.
+
+    See :class:`ipfsspec.readahead.ReadAhead` for details, the read-ahead
+    budget can be set per file using ``readahead_bytes``.
+    """
+
+    def __init__(self, fs, path, mode="rb", block_size="default", cache_type="readahead", cache_options=None,
+                 readahead_bytes=None, **kwargs):
+        info = fs.info(path)
+        if info["type"] != "file":
+            raise IsADirectoryError(path)
+        self.readahead = fs._readahead(info, readahead_bytes)
+        # the cache serves small reads without a round trip to the event loop
+        super().__init__(fs, path, mode, block_size, cache_type=cache_type, cache_options=cache_options,
+                         size=info["size"], **kwargs)
+        self._details = info
+
+    def _fetch_range(self, start, end):
+        return sync(self.fs.loop, self.readahead.read, start, end)
+
+    def close(self):
+        readahead = getattr(self, "readahead", None)
+        if not self.closed and readahead is not None:
+            self.fs.loop.call_soon_threadsafe(readahead.close)
+        super().close()
+
+
+class AsyncIPFSStreamedFile(AbstractAsyncStreamedFile):
+    """
+    Async read-only file with read-ahead, returned by :meth:`AsyncIPFSFileSystem.open_async`.
+
+    Iterating over the file yields verified chunks of up to ``block_size`` bytes.
+    """
+
+    def __init__(self, fs, path, info, mode="rb", block_size="default", readahead_bytes=None, **kwargs):
+        # reads go to the read-ahead directly, fsspec's caches can't fetch asynchronously
+        kwargs.pop("cache_type", None)
+        kwargs.pop("cache_options", None)
+        super().__init__(fs, path, mode, block_size, cache_type="none", size=info["size"], **kwargs)
+        self._details = info
+        self.readahead = fs._readahead(info, readahead_bytes)
+
+    async def _fetch_range(self, start, end):
+        return await self.readahead.read(start, end)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.read(self.blocksize)
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    async def close(self):
+        if not self.closed:
+            self.readahead.close()
+        await super().close()
+
+
 class AsyncIPNSFileSystem(AsyncIPFSFileSystem):
+    """
+    Filesystem for ``ipns://`` paths.
+
+    IPNS names are resolved once to an immutable ``/ipfs/<CID>`` path, which
+    is cached for the TTL of the IPNS record (or ``ipns_default_ttl`` seconds
+    if the name doesn't provide a TTL). All operations are then carried out
+    on the resolved path, such that they are verified like ``ipfs://`` paths.
+    """
     protocol = "ipns"
+    max_ipns_depth = 32
+
+    def __init__(self, *args, ipns_default_ttl=60, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ipns_default_ttl = ipns_default_ttl
+        self._names = {}
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._names = {}
+        super()._check_fork()
+
+    @property
+    def gateways(self):
+        return get_gateways("ipfs", gateway_addr=self.gateway_addr)
+
+    @property
+    def ipns_gateways(self):
+        return get_gateways("ipns", gateway_addr=self.gateway_addr)
+
+    async def _resolve_path(self, path):
+        name, _, rest = path.partition("/")
+        root = await self._resolve_name(name)
+        return root + "/" + rest if rest else root
+
+    async def _resolve_name(self, name, chain=()):
+        """
+        Resolves ``name`` to a path below ``/ipfs/`` (without the prefix).
+
+        Concurrent requests for the same name share a single lookup. ``chain``
+        holds the names which point to ``name``, lookups for these don't wait
+        for shared lookups, as those could wait for the chain in turn.
+        """
+        if name in chain:
+            raise FileNotFoundError(f"IPNS name {chain[0]} points to itself via {' -> '.join(chain + (name,))}")
+        expires, lookup = self._names.get(name, (0, None))
+        if lookup is not None and (expires > time.monotonic() if lookup.done() else not chain):
+            return (await lookup)[0]
+        if chain:
+            return (await self._lookup_name(name, chain + (name,)))[0]
+
+        lookup = asyncio.ensure_future(self._lookup_name(name, (name,)))
+        self._names[name] = (float("inf"), lookup)
+        try:
+            root, ttl = await lookup
+        except BaseException:
+            if self._names.get(name, (None, None))[1] is lookup:
+                del self._names[name]
+            raise
+        self._names[name] = (time.monotonic() + ttl, lookup)
+        logger.debug("resolved /ipns/%s to /ipfs/%s for %ss", name, root, ttl)
+        return root
+
+    async def _lookup_name(self, name, chain):
+        value, ttl = await self._failover(lambda gateway, session, _: gateway.resolve(name, session), self.ipns_gateways)
+        if ttl is None:
+            ttl = self.ipns_default_ttl
+        if value.startswith("/ipns/"):
+            if len(chain) > self.max_ipns_depth:
+                raise FileNotFoundError(f"too many levels of IPNS indirection resolving {chain[0]}")
+            inner_name, _, rest = value[len("/ipns/"):].partition("/")
+            value = "/ipfs/" + await self._resolve_name(inner_name, chain) + ("/" + rest if rest else "")
+        if not value.startswith("/ipfs/"):
+            raise FileNotFoundError(f"IPNS name {name} resolves to unsupported path {value}")
+        return value[len("/ipfs/"):].rstrip("/"), ttl
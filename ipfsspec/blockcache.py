@@ -0,0 +1,101 @@
+"""
+Caches for verified blocks.
+
+Blocks must be verified against their CID before they are put into a cache.
+Caches are keyed by multihash, so the same block is shared between CIDs which
+only differ in their codec or CID version.
+"""
+
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from multiformats import CID
+
+
+class MemoryBlockCache:
+    """
+    In-memory LRU cache of blocks, bounded by the total size of the cached blocks.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._blocks: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+    def __reduce__(self):
+        # only the configuration is pickled, not the cached blocks
+        return MemoryBlockCache, (self.max_bytes,)
+
+    def get(self, cid: CID) -> Optional[bytes]:
+        key = bytes(cid.digest)
+        data = self._blocks.get(key)
+        if data is not None:
+            self._blocks.move_to_end(key)
+        return data
+
+    def put(self, cid: CID, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        key = bytes(cid.digest)
+        old = self._blocks.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._blocks[key] = bytes(data)
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._blocks.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __contains__(self, cid: object) -> bool:
+        return isinstance(cid, CID) and bytes(cid.digest) in self._blocks
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+
+class DirectoryBlockCache:
+    """
+    Blocks stored as individual files below ``path``.
+
+    Files are written atomically, so a cache directory can be shared by
+    multiple processes. As the files may be modified outside of this process,
+    blocks are verified again when they are read.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _block_path(self, cid: CID) -> str:
+        name = bytes(cid.digest).hex()
+        return os.path.join(self.path, name[-3:-1], name)
+
+    def get(self, cid: CID) -> Optional[bytes]:
+        try:
+            with open(self._block_path(cid), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if cid.hashfun.digest(data) != cid.digest:
+            # corrupted on disk, drop it such that it'll be fetched again
+            try:
+                os.unlink(self._block_path(cid))
+            except FileNotFoundError:
+                pass
+            return None
+        return data
+
+    def put(self, cid: CID, data: bytes) -> None:
+        block_path = self._block_path(cid)
+        if os.path.exists(block_path):
+            return
+        os.makedirs(os.path.dirname(block_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(block_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, block_path)
+
+    def __contains__(self, cid: object) -> bool:
+        return isinstance(cid, CID) and os.path.exists(self._block_path(cid))
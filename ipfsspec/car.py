@@ -2,8 +2,14 @@
 CAR handling functions.
 """
 
-from typing import List, Optional, Tuple, Union, Iterator, BinaryIO
+from typing import Dict, List, Optional, Tuple, Union, Iterator, AsyncIterator, BinaryIO
+from concurrent.futures import Executor
+from collections import deque
+import asyncio
 import dataclasses
+import mmap
+import os
+import struct
 
 import dag_cbor
 from multiformats import CID, varint, multicodec, multihash
@@ -13,6 +19,14 @@ from .utils import is_cid_list, StreamLike, ensure_stream
 DagPbCodec = multicodec.get("dag-pb")
 Sha256Hash = multihash.get("sha2-256")
 
+# blocks of at least this size are hashed on an executor (if one is given),
+# smaller blocks are cheaper to verify inline than to hand over to another thread
+HASH_THRESHOLD = 256 * 1024
+
+CARV2_HEADER_SIZE = 40
+INDEX_SORTED = 0x0400
+MULTIHASH_INDEX_SORTED = 0x0401
+
 @dataclasses.dataclass
 class CARBlockLocation:
     varint_size: int
@@ -33,32 +47,67 @@ class CARBlockLocation:
         return self.varint_size + self.cid_size + self.payload_size
 
 
+@dataclasses.dataclass
+class CARv2Header:
+    """
+    Fixed size header following the CARv2 pragma.
+
+    ``data_offset`` and ``data_size`` locate the inner CARv1 payload,
+    ``index_offset`` locates the index (``0`` if there is none).
+    """
+    characteristics: bytes
+    data_offset: int
+    data_size: int
+    index_offset: int
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CARv2Header":
+        if len(data) != CARV2_HEADER_SIZE:
+            raise ValueError("CARv2 header is truncated")
+        data_offset, data_size, index_offset = struct.unpack_from("<QQQ", data, 16)
+        return cls(bytes(data[:16]), data_offset, data_size, index_offset)
+
+
 def decode_car_header(stream: BinaryIO) -> Tuple[List[CID], int]:
     """
-    Decodes a CAR header and returns the list of contained roots.
+    Decodes a CARv1 header and returns the list of contained roots.
     """
     header_size, visize, _ = varint.decode_raw(stream)  # type: ignore [call-overload] # varint uses BufferedIOBase
-    header = dag_cbor.decode(stream.read(header_size))
-    if not isinstance(header, dict):
-        raise ValueError("no valid CAR header found")
+    header = _decode_car_header_data(stream.read(header_size))
     if header["version"] != 1:
         raise ValueError("CAR is not version 1")
+    return header["roots"], visize + header_size
+
+
+def _decode_car_header_data(header_data: Union[bytes, memoryview]) -> dict:
+    header = dag_cbor.decode(bytes(header_data))
+    if not isinstance(header, dict):
+        raise ValueError("no valid CAR header found")
+    if header.get("version") == 2:
+        # this is the CARv2 pragma, the actual CARv2 header follows
+        return header
+    if header.get("version") != 1:
+        raise ValueError("CAR is not version 1 or 2")
     roots = header["roots"]
     if not isinstance(roots, list):
         raise ValueError("CAR header doesn't contain roots")
     if not is_cid_list(roots):
         raise ValueError("CAR roots do not only contain CIDs")
-    return roots, visize + header_size
+    return header
 
 
-def decode_raw_car_block(stream: BinaryIO) -> Optional[Tuple[CID, bytes, CARBlockLocation]]:
-    try:
-        block_size, visize, _ = varint.decode_raw(stream)  # type: ignore [call-overload] # varint uses BufferedIOBase
-    except ValueError:
-        # stream has likely been consumed entirely
-        return None
+def _skip(stream: BinaryIO, size: int) -> None:
+    if size < 0:
+        raise ValueError("CARv2 data offset points into the CARv2 header")
+    if len(stream.read(size)) != size:
+        raise ValueError("CARv2 payload is missing")
 
-    data = stream.read(block_size)
+
+def decode_section_cid(section: Union[bytes, memoryview]) -> Tuple[CID, int]:
+    """
+    Decodes the CID at the start of a CAR section and returns it with its size in bytes.
+    """
+    data = section
     # as the size of the CID is variable but not explicitly given in
     # the CAR format, we need to partially decode each CID to determine
     # its size and the location of the payload data
@@ -81,18 +130,88 @@ def decode_raw_car_block(stream: BinaryIO) -> Optional[Tuple[CID, bytes, CARBloc
         digest_size, _, data = varint.decode_raw(data)
         cid_digest = data[:digest_size]
         data = data[digest_size:]
-    cid = CID(default_base, cid_version, cid_codec, (hash_codec, cid_digest))
+    cid = CID(default_base, cid_version, cid_codec, (hash_codec, bytes(cid_digest)))
+    return cid, len(section) - len(data)
+
+
+def decode_car_section(section: bytes) -> Tuple[CID, bytes]:
+    """
+    Splits the contents of a CAR section into its CID and the block payload.
+
+    The payload is **not** verified against the CID, use :func:`verify_block` for that.
+    """
+    cid, cid_size = decode_section_cid(section)
+    return cid, bytes(section[cid_size:])
 
-    if not cid.hashfun.digest(data) == cid.digest:
-        raise ValueError(f"CAR is corrupted. Entry '{cid}' could not be verified")
 
-    return cid, bytes(data), CARBlockLocation(visize, block_size - len(data), len(data))
+class VerificationError(ValueError):
+    """
+    Raised if a block doesn't hash to its CID.
+    """
+
+
+class TruncatedCARError(ValueError):
+    """
+    Raised if a CAR stream ends within its header or a block.
+    """
+
+
+def verify_block(cid: CID, data: bytes, digest: Optional[bytes] = None) -> None:
+    """
+    Checks that ``data`` hashes to ``cid``.
+
+    If the multihash ``digest`` of ``data`` has already been computed elsewhere, it can be passed in.
+    """
+    if digest is None:
+        digest = cid.hashfun.digest(data)
+    if not digest == cid.digest:
+        raise VerificationError(f"CAR is corrupted. Entry '{cid}' could not be verified")
+
+
+def decode_raw_car_block(stream: BinaryIO) -> Optional[Tuple[CID, bytes, CARBlockLocation]]:
+    try:
+        block_size, visize, _ = varint.decode_raw(stream)  # type: ignore [call-overload] # varint uses BufferedIOBase
+    except ValueError:
+        # stream has likely been consumed entirely
+        return None
+
+    cid, data = decode_car_section(stream.read(block_size))
+    verify_block(cid, data)
+
+    return cid, data, CARBlockLocation(visize, block_size - len(data), len(data))
+
+
+def write_car_header(stream: BinaryIO, roots: List[CID]) -> int:
+    """
+    Writes a CARv1 header and returns the number of bytes written.
+    """
+    header = dag_cbor.encode({"version": 1, "roots": roots})
+    size_varint = varint.encode(len(header))
+    stream.write(size_varint)
+    stream.write(header)
+    return len(size_varint) + len(header)
+
+
+def write_car_block(stream: BinaryIO, cid: CID, data: bytes) -> int:
+    """
+    Writes a single CAR section and returns the number of bytes written.
+    """
+    cid_bytes = bytes(cid)
+    size_varint = varint.encode(len(cid_bytes) + len(data))
+    stream.write(size_varint)
+    stream.write(cid_bytes)
+    stream.write(data)
+    return len(size_varint) + len(cid_bytes) + len(data)
 
 
 def read_car(stream_or_bytes: StreamLike) -> Tuple[List[CID], Iterator[Tuple[CID, bytes, CARBlockLocation]]]:
     """
     Reads a CAR.
 
+    Both, CARv1 and CARv2 are supported. For CARv2, the blocks of the inner
+    CARv1 payload are returned and block offsets are relative to the start of
+    the CARv2 file. An embedded CARv2 index is ignored.
+
     Parameters
     ----------
     stream_or_bytes: StreamLike
@@ -106,11 +225,371 @@ def read_car(stream_or_bytes: StreamLike) -> Tuple[List[CID], Iterator[Tuple[CID
         Iterator over all blocks contained in the CAR
     """
     stream = ensure_stream(stream_or_bytes)
-    roots, header_size = decode_car_header(stream)
+    header_size, visize, _ = varint.decode_raw(stream)  # type: ignore [call-overload] # varint uses BufferedIOBase
+    header = _decode_car_header_data(stream.read(header_size))
+    offset, end = visize + header_size, None
+    if header["version"] == 2:
+        v2_header = CARv2Header.loads(stream.read(CARV2_HEADER_SIZE))
+        _skip(stream, v2_header.data_offset - offset - CARV2_HEADER_SIZE)
+        roots, inner_header_size = decode_car_header(stream)
+        offset = v2_header.data_offset + inner_header_size
+        end = v2_header.data_offset + v2_header.data_size
+    else:
+        roots = header["roots"]
+
     def blocks() -> Iterator[Tuple[CID, bytes, CARBlockLocation]]:
-        offset = header_size
-        while (next_block := decode_raw_car_block(stream)) is not None:
+        nonlocal offset
+        while (end is None or offset < end) and (next_block := decode_raw_car_block(stream)) is not None:
             cid, data, sizes = next_block
             yield cid, data, dataclasses.replace(sizes, offset=offset)
             offset += sizes.size
     return roots, blocks()
+
+
+async def _readexactly(reader: asyncio.StreamReader, n: int) -> bytes:
+    try:
+        return await reader.readexactly(n)
+    except asyncio.IncompleteReadError as e:
+        raise TruncatedCARError(f"CAR stream ended after {len(e.partial)} of {n} bytes") from e
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> Optional[Tuple[int, int]]:
+    """
+    Reads an unsigned varint from an async stream.
+
+    Returns ``None`` if the stream ended before the first byte of the varint.
+    """
+    value = 0
+    for i in range(9):
+        try:
+            byte = (await reader.readexactly(1))[0]
+        except asyncio.IncompleteReadError:
+            if i == 0:
+                return None
+            raise TruncatedCARError("CAR stream ended within a varint")
+        value |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return value, i + 1
+    raise ValueError("varint is too long")
+
+
+async def aread_car_header(reader: asyncio.StreamReader) -> Tuple[dict, int]:
+    """
+    Reads a CAR header (or CARv2 pragma) from an async stream.
+    """
+    header_varint = await _read_varint(reader)
+    if header_varint is None:
+        raise TruncatedCARError("no valid CAR header found")
+    header_size, visize = header_varint
+    header = _decode_car_header_data(await _readexactly(reader, header_size))
+    return header, visize + header_size
+
+
+async def aread_car(reader: asyncio.StreamReader,
+                    executor: Optional[Executor] = None,
+                    hash_threshold: int = HASH_THRESHOLD,
+                    max_pending: int = 16,
+                    ) -> Tuple[List[CID], AsyncIterator[Tuple[CID, bytes, CARBlockLocation]]]:
+    """
+    Reads a CAR from an async stream (e.g. ``aiohttp.ClientResponse.content``).
+
+    Like :func:`read_car`, this supports CARv1 and CARv2.
+
+    Every block is verified before it is yielded. If an ``executor`` is given,
+    blocks of at least ``hash_threshold`` bytes are hashed on that executor,
+    such that verification runs in parallel to receiving further blocks
+    (``hashlib`` releases the GIL). Blocks are still yielded in stream order,
+    at most ``max_pending`` blocks are buffered while waiting for their hashes.
+
+    Parameters
+    ----------
+    reader: asyncio.StreamReader
+        Stream to read CAR from, must provide ``readexactly``
+    executor: Executor, optional
+        Executor to compute hashes of large blocks on
+    hash_threshold: int
+        Minimum block size for hashing on ``executor``
+    max_pending: int
+        Maximum number of received blocks waiting for verification
+
+    Returns
+    -------
+    roots : List[CID]
+        Roots as given by the CAR header
+    blocks : AsyncIterator[Tuple[cid, BytesLike, CARBlockLocation]]
+        Iterator over all blocks contained in the CAR
+    """
+    header, offset = await aread_car_header(reader)
+    end = None
+    if header["version"] == 2:
+        v2_header = CARv2Header.loads(await _readexactly(reader, CARV2_HEADER_SIZE))
+        skip = v2_header.data_offset - offset - CARV2_HEADER_SIZE
+        if skip < 0:
+            raise ValueError("CARv2 data offset points into the CARv2 header")
+        await _readexactly(reader, skip)
+        header, inner_header_size = await aread_car_header(reader)
+        if header["version"] != 1:
+            raise ValueError("CAR is not version 1")
+        offset = v2_header.data_offset + inner_header_size
+        end = v2_header.data_offset + v2_header.data_size
+    roots = header["roots"]
+
+    async def blocks() -> AsyncIterator[Tuple[CID, bytes, CARBlockLocation]]:
+        loop = asyncio.get_running_loop()
+        pending: deque = deque()
+
+        async def checked(entry):
+            cid, data, location, digest = entry
+            if digest is not None:
+                verify_block(cid, data, await digest)
+            return cid, data, location
+
+        nonlocal offset
+        try:
+            while (end is None or offset < end) and (section_varint := await _read_varint(reader)) is not None:
+                block_size, visize = section_varint
+                cid, data = decode_car_section(await _readexactly(reader, block_size))
+                location = CARBlockLocation(visize, block_size - len(data), len(data), offset)
+                offset += location.size
+                if executor is not None and len(data) >= hash_threshold:
+                    digest = loop.run_in_executor(executor, cid.hashfun.digest, data)
+                else:
+                    verify_block(cid, data)
+                    digest = None
+                pending.append((cid, data, location, digest))
+                while pending and (len(pending) > max_pending
+                                   or pending[0][3] is None
+                                   or pending[0][3].done()):
+                    yield await checked(pending.popleft())
+            while pending:
+                yield await checked(pending.popleft())
+        finally:
+            for *_, digest in pending:
+                if digest is not None:
+                    digest.cancel()
+
+    return roots, blocks()
+
+
+class CARIndex:
+    """
+    CID -> offset index in the sorted layout of CARv2 indices.
+
+    For every multihash code and record width, the index holds one buffer of
+    fixed-width records ``digest || offset`` (``offset`` as little-endian
+    uint64) sorted by digest, exactly as they are stored in a serialized
+    ``MultihashIndexSorted`` index. Lookups are binary searches within these
+    buffers, so loading a (memory mapped) index does not require any per-block
+    work. Offsets point to the start of a section, relative to the start of
+    the CARv1 payload.
+
+    ``IndexSorted`` indices don't distinguish multihash codes, their records
+    are stored with the code ``None``.
+    """
+
+    def __init__(self, buckets: Dict[Optional[int], Dict[int, memoryview]]):
+        self.buckets = buckets
+
+    def __len__(self) -> int:
+        return sum(len(records) // width
+                   for widths in self.buckets.values()
+                   for width, records in widths.items())
+
+    def find(self, cid: CID) -> Optional[int]:
+        """
+        Offset of the section containing ``cid``, ``None`` if it's not indexed.
+        """
+        widths = self.buckets.get(cid.hashfun.code, self.buckets.get(None))
+        if widths is None:
+            return None
+        digest = bytes(cid.raw_digest)
+        width = len(digest) + 8
+        records = widths.get(width)
+        if records is None:
+            return None
+        lo, hi = 0, len(records) // width
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(records[mid * width:(mid + 1) * width - 8]) < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(records) // width and records[lo * width:(lo + 1) * width - 8] == digest:
+            return struct.unpack_from("<Q", records, (lo + 1) * width - 8)[0]
+        return None
+
+    @classmethod
+    def from_entries(cls, entries: Iterator[Tuple[CID, int]]) -> "CARIndex":
+        """
+        Builds an index from ``(CID, offset)`` pairs.
+        """
+        collected: Dict[int, Dict[int, List[bytes]]] = {}
+        for cid, offset in entries:
+            digest = bytes(cid.raw_digest)
+            collected.setdefault(cid.hashfun.code, {}) \
+                     .setdefault(len(digest) + 8, []) \
+                     .append(digest + struct.pack("<Q", offset))
+        return cls({code: {width: memoryview(b"".join(sorted(records)))
+                           for width, records in widths.items()}
+                    for code, widths in collected.items()})
+
+    @classmethod
+    def loads(cls, buffer: Union[bytes, memoryview, mmap.mmap]) -> "CARIndex":
+        """
+        Loads a serialized index (including its multicodec prefix) without copying the records.
+        """
+        buffer = memoryview(buffer)
+        codec, pos, _ = varint.decode_raw(buffer[:9])
+        buckets: Dict[Optional[int], Dict[int, memoryview]] = {}
+        if codec == INDEX_SORTED:
+            buckets[None], _ = cls._load_sorted(buffer, pos)
+            return cls(buckets)
+        if codec != MULTIHASH_INDEX_SORTED:
+            raise ValueError(f"unsupported CAR index codec 0x{codec:x}")
+        (code_count,), pos = struct.unpack_from("<i", buffer, pos), pos + 4
+        for _ in range(code_count):
+            (code,), pos = struct.unpack_from("<Q", buffer, pos), pos + 8
+            buckets[code], pos = cls._load_sorted(buffer, pos)
+        return cls(buckets)
+
+    @staticmethod
+    def _load_sorted(buffer: memoryview, pos: int) -> Tuple[Dict[int, memoryview], int]:
+        (width_count,), pos = struct.unpack_from("<i", buffer, pos), pos + 4
+        widths = {}
+        for _ in range(width_count):
+            width, length = struct.unpack_from("<Iq", buffer, pos)
+            pos += 12
+            if width <= 8 or length % width != 0 or pos + length > len(buffer):
+                raise ValueError("CAR index is corrupted")
+            widths[width] = buffer[pos:pos + length]
+            pos += length
+        return widths, pos
+
+    def dump(self, stream: BinaryIO) -> None:
+        """
+        Writes the index as ``MultihashIndexSorted``, as used by CARv2 and ``car index``.
+
+        Indices loaded from ``IndexSorted`` are written as ``IndexSorted``.
+        """
+        if None in self.buckets:
+            stream.write(varint.encode(INDEX_SORTED))
+            self._dump_sorted(stream, self.buckets[None])
+            return
+        stream.write(varint.encode(MULTIHASH_INDEX_SORTED))
+        stream.write(struct.pack("<i", len(self.buckets)))
+        for code, widths in sorted(self.buckets.items()):
+            stream.write(struct.pack("<Q", code))
+            self._dump_sorted(stream, widths)
+
+    @staticmethod
+    def _dump_sorted(stream: BinaryIO, widths: Dict[int, memoryview]) -> None:
+        stream.write(struct.pack("<i", len(widths)))
+        for width, records in sorted(widths.items()):
+            stream.write(struct.pack("<Iq", width, len(records)))
+            stream.write(records)
+
+
+class MappedCAR:
+    """
+    Read-only, memory mapped CAR file with random access to its blocks.
+
+    Blocks are located using a :class:`CARIndex`. For CARv2 files with an
+    embedded index, that index is used directly. Otherwise it's loaded from the
+    sidecar file ``index_path`` (default: ``<path>.idx``) or built by scanning
+    the CAR once (and then stored to the sidecar file if ``write_index`` is set).
+    Blocks are verified against their CID on every access and returned as
+    zero-copy views into the mapped file.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], index_path: Optional[Union[str, os.PathLike]] = None, write_index: bool = True):
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        self.v2_header: Optional[CARv2Header] = None
+        header, self._first_section = self._header_at(self._buffer)
+        if header["version"] == 2:
+            self.v2_header = CARv2Header.loads(self._buffer[self._first_section:self._first_section + CARV2_HEADER_SIZE])
+            self._data = self._buffer[self.v2_header.data_offset:self.v2_header.data_offset + self.v2_header.data_size]
+            header, self._first_section = self._header_at(self._data)
+            if header["version"] != 1:
+                raise ValueError("CAR is not version 1")
+        else:
+            self._data = self._buffer
+        self.roots = header["roots"]
+
+        self.index_path = os.fspath(index_path) if index_path is not None else self.path + ".idx"
+        if self.v2_header is not None and self.v2_header.index_offset:
+            self.index = CARIndex.loads(self._buffer[self.v2_header.index_offset:])
+        else:
+            self.index = self._load_index(write_index)
+
+    @staticmethod
+    def _header_at(buffer: memoryview) -> Tuple[dict, int]:
+        header_size, visize, _ = varint.decode_raw(buffer[:9])
+        return _decode_car_header_data(buffer[visize:visize + header_size]), visize + header_size
+
+    def _load_index(self, write_index: bool) -> CARIndex:
+        if os.path.exists(self.index_path) and os.path.getmtime(self.index_path) >= os.path.getmtime(self.path):
+            try:
+                with open(self.index_path, "rb") as f:
+                    return CARIndex.loads(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except (OSError, ValueError, struct.error):
+                pass  # unreadable sidecar index, rebuild it
+
+        index = CARIndex.from_entries((cid, location.offset) for cid, location in self.iter_sections())
+        if write_index:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    index.dump(f)
+                os.replace(tmp_path, self.index_path)
+            except OSError:
+                # the index is only an optimization, a read-only location must not prevent reading
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        return index
+
+    def iter_sections(self) -> Iterator[Tuple[CID, CARBlockLocation]]:
+        """
+        Iterates over all sections without verifying the blocks.
+
+        Offsets are relative to the start of the CARv1 payload.
+        """
+        offset = self._first_section
+        while offset < len(self._data):
+            cid, location = self._section_at(offset)
+            yield cid, location
+            offset += location.size
+
+    def _section_at(self, offset: int) -> Tuple[CID, CARBlockLocation]:
+        section_size, visize, _ = varint.decode_raw(self._data[offset:offset + 9])
+        cid, cid_size = decode_section_cid(self._data[offset + visize:offset + visize + min(section_size, 128)])
+        return cid, CARBlockLocation(visize, cid_size, section_size - cid_size, offset)
+
+    def get(self, cid: CID) -> Optional[memoryview]:
+        """
+        Verified block data of ``cid`` or ``None`` if the CAR doesn't contain it.
+        """
+        offset = self.index.find(cid)
+        if offset is None:
+            return None
+        found, location = self._section_at(offset)
+        if found.digest != cid.digest:
+            raise ValueError(f"CAR index of '{self.path}' is corrupted, entry '{cid}' points to '{found}'")
+        data = self._data[location.payload_offset:location.payload_offset + location.payload_size]
+        verify_block(cid, data)
+        return data
+
+    def __contains__(self, cid: object) -> bool:
+        return isinstance(cid, CID) and self.index.find(cid) is not None
+
+    def __getitem__(self, cid: CID) -> memoryview:
+        data = self.get(cid)
+        if data is None:
+            raise KeyError(cid)
+        return data
+
+    def __len__(self) -> int:
+        return len(self.index)
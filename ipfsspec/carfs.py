@@ -0,0 +1,90 @@
+"""
+Offline, read-only fsspec filesystem on top of local CAR files.
+"""
+
+import os
+from collections import ChainMap
+
+from fsspec.spec import AbstractFileSystem, AbstractBufferedFile
+from multiformats import CID
+
+from .car import MappedCAR
+from .dag import verify_merkle_path, node_info, directory_links, iter_file_range
+
+
+class CARFileSystem(AbstractFileSystem):
+    """
+    Serves UnixFS files and directories contained in one or more local CAR files.
+
+    Paths are formed like for :class:`ipfsspec.AsyncIPFSFileSystem`, i.e.
+    ``car://<CID>/path/to/file``. The CAR files are memory mapped and every
+    block is verified against its CID when it's read, so the same guarantees
+    as for data fetched from a gateway apply.
+
+    Parameters
+    ----------
+    car_path: str or list of str
+        Local CAR file(s) to serve blocks from
+    write_index: bool
+        Store the CID -> offset index built for each CAR in a sidecar file
+        (``<car_path>.idx``, ``MultihashIndexSorted`` format), such that
+        later instances can load it without scanning the CAR.
+    """
+    protocol = "car"
+    sep = "/"
+
+    def __init__(self, car_path, write_index=True, **storage_options):
+        super().__init__(**storage_options)
+        if isinstance(car_path, (str, os.PathLike)):
+            car_path = [car_path]
+        self.cars = [MappedCAR(p, write_index=write_index) for p in car_path]
+        self.blocks = ChainMap(*self.cars)
+
+    def _block(self, cid):
+        try:
+            return self.blocks[cid]
+        except KeyError:
+            raise FileNotFoundError(f"block {cid} is not contained in any CAR") from None
+
+    def _resolve(self, path):
+        path = self._strip_protocol(path)
+        return path, verify_merkle_path(path, self.blocks)
+
+    def ls(self, path, detail=True, **kwargs):
+        path, cid = self._resolve(path)
+        links = directory_links(path, cid, self._block(cid))
+        if detail:
+            children = [(path + "/" + link.Name, CID.decode(link.Hash)) for link in links]
+            return [node_info(child_path, child, self._block(child)) for child_path, child in children]
+        else:
+            return [path + "/" + link.Name for link in links]
+
+    def info(self, path, **kwargs):
+        path, cid = self._resolve(path)
+        return node_info(path, cid, self._block(cid))
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        path, cid = self._resolve(path)
+        info = node_info(path, cid, self._block(cid))
+        if info["type"] != "file":
+            raise IsADirectoryError(path)
+        size = info["size"]
+        start = 0 if start is None else start if start >= 0 else max(size + start, 0)
+        end = size if end is None else min(end if end >= 0 else size + end, size)
+        if start >= end:
+            return b""
+        return b"".join(iter_file_range(self._block, cid, start, end))
+
+    def _open(self, path, mode="rb", block_size="default", autocommit=True, cache_options=None, **kwargs):
+        if mode != "rb":
+            raise NotImplementedError("opening modes other than read binary are not implemented")
+        return CARBufferedFile(self, path, mode, block_size, cache_options=cache_options, **kwargs)
+
+    def ukey(self, path):
+        """returns the CID, which is by definition an unchanging identitifer"""
+        return self.info(path)["CID"]
+
+
+class CARBufferedFile(AbstractBufferedFile):
+    def _fetch_range(self, start, end):
+        return self.fs.cat_file(self.path, start, end)
@@ -0,0 +1,290 @@
+"""
+UnixFS DAG traversal, independent of where the blocks come from.
+
+All functions take blocks as a mapping (or callable) from CID to block data.
+The mapping is expected to only contain blocks which have been verified
+against their CID, e.g. blocks obtained from :func:`ipfsspec.car.read_car`.
+"""
+
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Mapping, Optional, Tuple
+
+from multiformats import CID, multicodec
+
+from . import unixfsv1
+
+DagPbCodec = multicodec.get("dag-pb")
+RawCodec = multicodec.get("raw")
+
+BlockMap = Mapping[CID, bytes]
+
+
+def verify_merkle_path(path: str, blocks: BlockMap) -> CID:
+    """
+    Verify that blocks form a valid chain from root CID through path segments.
+
+    According to the trustless gateway spec, dag-scope=block returns blocks
+    needed to verify path segments. This function validates the chain of custody
+    by checking that each parent block contains a PBLink to its child.
+
+    Args:
+        path: Full path like "bafy/dir/file"
+        blocks: Dict mapping CID -> block data from CAR response
+
+    Returns:
+        Final CID at the end of the path
+
+    Raises:
+        FileNotFoundError: If path cannot be verified through the chain
+    """
+    segments = path.split("/")
+
+    # First segment must be the root CID
+    try:
+        current_cid = CID.decode(segments[0])
+    except Exception as e:
+        raise FileNotFoundError(f"Invalid root CID in path: {segments[0]}") from e
+
+    # Verify root block exists in CAR
+    if current_cid not in blocks:
+        raise FileNotFoundError(f"Root block {current_cid} not found in CAR response")
+
+    # Walk through path segments, validating each link
+    for segment in segments[1:]:
+        current_block = blocks[current_cid]
+
+        # Decode as PBNode to access links
+        if current_cid.codec != DagPbCodec:
+            raise FileNotFoundError(f"Cannot traverse path through non-DAG-PB block: {current_cid}")
+
+        node = unixfsv1.PBNode.loads(current_block)
+
+        # Find link matching this path segment
+        matching_link = None
+        for link in node.Links:
+            if link.Name == segment:
+                matching_link = link
+                break
+
+        if matching_link is None:
+            raise FileNotFoundError(f"Path segment '{segment}' not found in directory {current_cid}")
+
+        # Decode the child CID from the link's Hash
+        try:
+            child_cid = CID.decode(matching_link.Hash)
+        except Exception as e:
+            raise FileNotFoundError(f"Invalid CID in link '{segment}'") from e
+
+        # Verify child block exists in CAR
+        if child_cid not in blocks:
+            raise FileNotFoundError(f"Child block {child_cid} for path segment '{segment}' not found in CAR response")
+
+        current_cid = child_cid
+
+    return current_cid
+
+
+def node_info(path: str, cid: CID, block: bytes) -> dict:
+    """
+    fsspec info dictionary of the UnixFS node ``block`` (with CID ``cid``) found at ``path``.
+    """
+    if cid.codec == RawCodec:
+        return {
+            "name": path,
+            "CID": str(cid),
+            "type": "file",
+            "size": len(block),
+        }
+    elif cid.codec == DagPbCodec:
+
+        node = unixfsv1.PBNode.loads(block)
+        data = unixfsv1.Data.loads(node.Data)
+        if data.Type == unixfsv1.DataType.Raw:
+            raise FileNotFoundError(path)  # this is not a file, it's only a part of it
+        elif data.Type == unixfsv1.DataType.Directory:
+            return {
+                "name": path,
+                "CID": str(cid),
+                "type": "directory",
+                "islink": False,
+            }
+        elif data.Type == unixfsv1.DataType.File:
+            return {
+                "name": path,
+                "CID": str(cid),
+                "type": "file",
+                "size": data.filesize,
+                "islink": False,
+            }
+        elif data.Type == unixfsv1.DataType.Metadata:
+            raise NotImplementedError(f"The path '{path}' contains a Metadata node, this is currently not implemented")
+        elif data.Type == unixfsv1.DataType.Symlink:
+            return {
+                "name": path,
+                "CID": str(cid),
+                "type": "other",  # TODO: maybe we should have directory or file as returning type, but that probably would require resolving at least another level of blocks
+                "islink": True,
+            }
+        elif data.Type == unixfsv1.DataType.HAMTShard:
+            raise NotImplementedError(f"The path '{path}' contains a HAMTSharded directory, this is currently not implemented")
+    raise FileNotFoundError(path)  # it exists, but is not a UNIXFSv1 object, so it's not a file
+
+
+def directory_links(path: str, cid: CID, block: bytes) -> List[unixfsv1.PBLink]:
+    """
+    Links of the UnixFS directory ``block`` (with CID ``cid``) found at ``path``.
+    """
+    if cid.codec != DagPbCodec:
+        raise NotADirectoryError(f"Path {path} does not resolve to a directory")
+
+    node = unixfsv1.PBNode.loads(block)
+    data = unixfsv1.Data.loads(node.Data)
+    if data.Type != unixfsv1.DataType.Directory:
+        # TODO: we might need support for HAMTShard here (for large directories)
+        raise NotADirectoryError(path)
+    return node.Links
+
+
+def file_layout(cid: CID, block: bytes) -> Tuple[bytes, List[Tuple[int, int, CID]]]:
+    """
+    Splits a UnixFS file node into its inline data and its children.
+
+    Returns
+    -------
+    data : bytes
+        Data stored within the node itself, it comes first in the file
+    children : List[Tuple[offset, size, CID]]
+        Children of this node with offset and size relative to the start of the node
+    """
+    if cid.codec == RawCodec:
+        return block, []
+    if cid.codec != DagPbCodec:
+        raise ValueError(f"{cid} is not a UnixFS file")
+
+    node = unixfsv1.PBNode.loads(block)
+    data = unixfsv1.Data.loads(node.Data)
+    if data.Type == unixfsv1.DataType.Directory:
+        raise IsADirectoryError(str(cid))
+    if data.Type not in (unixfsv1.DataType.File, unixfsv1.DataType.Raw):
+        raise ValueError(f"{cid} is not a UnixFS file")
+    if len(data.blocksizes) != len(node.Links):
+        raise ValueError(f"UnixFS node {cid} has {len(node.Links)} links but {len(data.blocksizes)} blocksizes")
+
+    inline = data.Data or b""
+    children = []
+    offset = len(inline)
+    for link, size in zip(node.Links, data.blocksizes):
+        children.append((offset, size, CID.decode(link.Hash)))
+        offset += size
+    return inline, children
+
+
+def iter_file_range(get_block: Callable[[CID], bytes], cid: CID, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields the pieces of the bytes ``start:end`` of the UnixFS file ``cid``.
+
+    Only blocks overlapping the requested range are requested from ``get_block``.
+    Pieces may be zero-copy views into the blocks returned by ``get_block``.
+    """
+    inline, children = file_layout(cid, get_block(cid))
+    if end is None:
+        end = children[-1][0] + children[-1][1] if children else len(inline)
+    if start < len(inline):
+        yield memoryview(inline)[start:min(end, len(inline))]
+    for offset, size, child in children:
+        if offset >= end:
+            break
+        if offset + size > start:
+            yield from iter_file_range(get_block, child, max(start - offset, 0), min(end - offset, size))
+
+
+async def aiter_file_range(get_block: Callable[[CID, Optional[int]], Awaitable[bytes]], cid: CID,
+                           start: int = 0, end: Optional[int] = None, size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Async version of :func:`iter_file_range`.
+
+    ``get_block`` is called with the CID and the size of the file contents below it (if known).
+    """
+    inline, children = file_layout(cid, await get_block(cid, size))
+    if end is None:
+        end = children[-1][0] + children[-1][1] if children else len(inline)
+    if start < len(inline):
+        yield memoryview(inline)[start:min(end, len(inline))]
+    for offset, child_size, child in children:
+        if offset >= end:
+            break
+        if offset + child_size > start:
+            async for piece in aiter_file_range(get_block, child, max(start - offset, 0), min(end - offset, child_size), child_size):
+                yield piece
+
+
+def links(cid: CID, block: bytes) -> List[CID]:
+    """
+    CIDs linked from ``block``. Only DAG-PB blocks have links, others are leaves.
+    """
+    if cid.codec != DagPbCodec:
+        return []
+    return [CID.decode(link.Hash) for link in unixfsv1.PBNode.loads(block).Links]
+
+
+def links_by_name(cid: CID, block: bytes) -> dict:
+    """
+    Named links of a DAG-PB directory block.
+    """
+    if cid.codec != DagPbCodec:
+        raise FileNotFoundError(f"Cannot traverse path through non-DAG-PB block: {cid}")
+    return {link.Name: CID.decode(link.Hash) for link in unixfsv1.PBNode.loads(block).Links}
+
+
+class SubtreeVerifier:
+    """
+    Verifies a stream of blocks for ``path`` as sent by a trustless gateway for ``dag-scope=all``.
+
+    The stream must start with the blocks along ``path`` and then contain the
+    complete DAG below the path target, each block exactly once. Blocks are
+    fed in one by one via :meth:`add`, only the CIDs of expected blocks are
+    kept, such that the DAG can be verified without holding on to the data.
+    """
+
+    def __init__(self, path: str):
+        segments = path.split("/")
+        try:
+            root = CID.decode(segments[0])
+        except Exception as e:
+            raise FileNotFoundError(f"Invalid root CID in path: {segments[0]}") from e
+        self._segments = segments[1:]
+        self._expected = {root}
+        self._seen: set = set()
+        self.root: Optional[CID] = root if not self._segments else None
+
+    def add(self, cid: CID, block: bytes) -> bool:
+        """
+        Checks the next block of the stream.
+
+        Returns ``True`` if the block is part of the subtree below the path
+        target, ``False`` if it's only needed to resolve the path.
+        """
+        if cid not in self._expected:
+            raise ValueError(f"unexpected block {cid} in DAG response")
+        self._expected.remove(cid)
+
+        if self._segments:
+            segment = self._segments.pop(0)
+            child = links_by_name(cid, block).get(segment)
+            if child is None:
+                raise FileNotFoundError(f"Path segment '{segment}' not found in directory {cid}")
+            self._expected = {child}
+            if not self._segments:
+                self.root = child
+            return False
+
+        self._seen.add(cid)
+        self._expected.update(child for child in links(cid, block) if child not in self._seen)
+        return True
+
+    def finish(self) -> None:
+        """
+        Raises if the stream ended before all blocks of the subtree have been seen.
+        """
+        if self._segments or self._expected:
+            missing = ", ".join(str(cid) for cid in list(self._expected)[:3])
+            raise ValueError(f"DAG response is incomplete, missing blocks: {missing}")
@@ -0,0 +1,165 @@
+"""
+UnixFS CIDs of local files, computed the way a given remote file DAG was built.
+
+Only the balanced layout (the default of common importers) is reproduced.
+Files imported differently (e.g. using the trickle layout) yield a different
+CID, so comparisons fail safe: the file just isn't recognized as identical.
+"""
+
+import asyncio
+import dataclasses
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from multiformats import CID, multihash, varint
+
+from . import unixfsv1
+from .dag import DagPbCodec, RawCodec
+
+DEFAULT_MAX_LINKS = 174
+
+GetBlock = Callable[[CID, Optional[int]], Awaitable[bytes]]
+Link = Tuple[CID, int, int]  # CID, file size and cumulative block size (Tsize) of a subtree
+
+
+@dataclasses.dataclass
+class ImportLayout:
+    """
+    Parameters of a balanced UnixFS file DAG.
+    """
+    chunk_size: int
+    raw_leaves: bool
+    cid_version: int
+    hash_function: str
+    max_links: int = DEFAULT_MAX_LINKS
+    # files of a single chunk are represented by the leaf itself, unless this is set
+    wrap_single_leaf: bool = False
+
+
+def leaf_block(data: bytes, layout: ImportLayout) -> Tuple[CID, bytes]:
+    if layout.raw_leaves:
+        return _make_cid(layout, "raw", data), data
+    # empty files have no Data field, as common importers write them
+    node = unixfsv1.Data(Type=unixfsv1.DataType.File, Data=data or None, filesize=len(data))
+    block = unixfsv1.PBNode(Data=node.dumps()).dumps()
+    return _make_cid(layout, "dag-pb", block), block
+
+
+def node_block(children: List[Link], layout: ImportLayout) -> Tuple[CID, bytes]:
+    data = unixfsv1.Data(Type=unixfsv1.DataType.File, filesize=sum(size for _, size, _ in children),
+                         blocksizes=[size for _, size, _ in children])
+    block = unixfsv1.PBNode(Links=[unixfsv1.PBLink(Hash=bytes(cid), Name="", Tsize=tsize) for cid, _, tsize in children],
+                            Data=data.dumps()).dumps()
+    return _make_cid(layout, "dag-pb", block), block
+
+
+def _make_cid(layout: ImportLayout, codec: str, block: bytes) -> CID:
+    digest = multihash.get(layout.hash_function).digest(block)
+    if layout.cid_version == 0 and codec == "dag-pb":
+        return CID("base58btc", 0, codec, digest)
+    return CID("base32", 1, codec, digest)  # raw leaves always have CIDv1
+
+
+def _leaf_link(data: bytes, layout: ImportLayout) -> Link:
+    cid, block = leaf_block(data, layout)
+    return cid, len(data), len(block)
+
+
+def _node_link(children: List[Link], layout: ImportLayout) -> Link:
+    cid, block = node_block(children, layout)
+    return cid, sum(size for _, size, _ in children), len(block) + sum(tsize for _, _, tsize in children)
+
+
+def _is_leaf_link(link: unixfsv1.PBLink, size: int) -> bool:
+    """
+    Checks whether ``link`` to a DAG-PB node with ``size`` bytes of file content points to a leaf.
+
+    The cumulative size of a leaf is just its own block size, interior nodes
+    add the blocks below them, so the leaf doesn't need to be fetched.
+    """
+    def field_size(length):
+        return 1 + len(varint.encode(length)) + length
+
+    data_size = 2 + (field_size(size) if size else 0) + 1 + len(varint.encode(size))
+    return link.Tsize == field_size(data_size)
+
+
+async def infer_layout(get_block: GetBlock, cid: CID, size: int) -> Optional[ImportLayout]:
+    """
+    Infers the layout of the UnixFS file ``cid`` of ``size`` bytes from its root block.
+
+    Blocks are requested from ``get_block``: the root and, if it doesn't link
+    to the leaves directly, the leftmost interior nodes, but never a leaf.
+    Returns ``None`` if the file isn't a balanced DAG.
+    """
+    hash_function = cid.hashfun.name
+    if cid.codec == RawCodec:
+        return ImportLayout(max(size, 1), True, cid.version, hash_function)
+    if cid.codec != DagPbCodec:
+        return None
+
+    root = unixfsv1.PBNode.loads(await get_block(cid, size))
+    data = unixfsv1.Data.loads(root.Data)
+    if data.Type != unixfsv1.DataType.File:
+        return None
+    if not root.Links:
+        return ImportLayout(max(len(data.Data or b""), 1), False, cid.version, hash_function)
+    if data.Data or len(data.blocksizes) != len(root.Links):
+        return None
+
+    max_links = max(DEFAULT_MAX_LINKS, len(root.Links))
+    node = root
+    parent_links = 1
+    while True:
+        link, size = node.Links[0], data.blocksizes[0]
+        child = CID.decode(link.Hash)
+        if child.codec == RawCodec or _is_leaf_link(link, size):
+            return ImportLayout(size, child.codec == RawCodec, cid.version, hash_function,
+                                max_links=max_links, wrap_single_leaf=True)
+        parent_links = len(node.Links)
+        node = unixfsv1.PBNode.loads(await get_block(child, size))
+        data = unixfsv1.Data.loads(node.Data)
+        if not node.Links or data.Data or len(data.blocksizes) != len(node.Links):
+            return None
+        if parent_links > 1:
+            # leftmost children of nodes with siblings are full
+            max_links = len(node.Links)
+
+
+def hash_group(path: str, layout: ImportLayout, first_leaf: int, size: int) -> Link:
+    """
+    Reads and hashes the leaves of the lowest-level node starting with leaf number ``first_leaf``.
+
+    Returns the link to the leaf itself for files of a single unwrapped leaf.
+    """
+    start = first_leaf * layout.chunk_size
+    end = min(start + layout.max_links * layout.chunk_size, size)
+    with open(path, "rb") as f:
+        f.seek(start)
+        leaves = [_leaf_link(f.read(min(layout.chunk_size, end - offset)), layout)
+                  for offset in range(start, max(end, start + 1), layout.chunk_size)]
+    if len(leaves) == 1 and size <= layout.chunk_size and not layout.wrap_single_leaf:
+        return leaves[0]
+    return _node_link(leaves, layout)
+
+
+async def afile_cid(path: str, size: int, layout: ImportLayout,
+                    run: Optional[Callable[..., Awaitable[Link]]] = None) -> CID:
+    """
+    CID of the local file ``path`` of ``size`` bytes, imported with ``layout``.
+
+    The lowest-level nodes are hashed in parallel by ``run(func, *args)``,
+    which defaults to running them on the default executor of the loop.
+    """
+    if run is None:
+        loop = asyncio.get_running_loop()
+
+        def run(func, *args):
+            return loop.run_in_executor(None, func, *args)
+
+    leaves = max(-(-size // layout.chunk_size), 1)
+    level = list(await asyncio.gather(*(run(hash_group, os.fspath(path), layout, first_leaf, size)
+                                        for first_leaf in range(0, leaves, layout.max_links))))
+    while len(level) > 1:
+        level = [_node_link(level[i:i + layout.max_links], layout) for i in range(0, len(level), layout.max_links)]
+    return level[0][0]
@@ -0,0 +1,84 @@
+"""
+from IPNS record spec (https://specs.ipfs.tech/ipns/ipns-record/):
+
+message IpnsEntry {
+  enum ValidityType {
+    EOL = 0;
+  }
+  optional bytes value = 1;
+  optional bytes signatureV1 = 2;
+  optional ValidityType validityType = 3;
+  optional bytes validity = 4;
+  optional uint64 sequence = 5;
+  optional uint64 ttl = 6;
+  optional bytes pubKey = 7;
+  optional bytes signatureV2 = 8;
+  optional bytes data = 9;
+}
+
+``data`` is a DAG-CBOR map containing ``Value``, ``Validity``, ``ValidityType``,
+``Sequence`` and ``TTL``, which take precedence over the V1 fields.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import dag_cbor
+from pure_protobuf.dataclasses_ import field, message  # type: ignore
+from pure_protobuf.types import int32, uint64  # type: ignore
+
+RFC3339_RE = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$")
+
+
+@message
+@dataclass
+class IpnsEntry:
+    # pylint: disable=too-many-instance-attributes
+    value: Optional[bytes] = field(1, default=None)
+    signatureV1: Optional[bytes] = field(2, default=None)
+    validityType: Optional[int32] = field(3, default=None)
+    validity: Optional[bytes] = field(4, default=None)
+    sequence: Optional[uint64] = field(5, default=None)
+    ttl: Optional[uint64] = field(6, default=None)
+    pubKey: Optional[bytes] = field(7, default=None)
+    signatureV2: Optional[bytes] = field(8, default=None)
+    data: Optional[bytes] = field(9, default=None)
+
+
+def parse_rfc3339(value: str) -> datetime:
+    match = RFC3339_RE.match(value)
+    if match is None:
+        raise ValueError(f"invalid timestamp: {value}")
+    date, fraction, tz = match.groups()
+    if fraction:
+        date += "." + fraction[:6].ljust(6, "0")
+    return datetime.fromisoformat(date + ("+00:00" if tz == "Z" else tz))
+
+
+def parse_ipns_record(record: bytes, now: Optional[datetime] = None) -> Tuple[str, Optional[float]]:
+    """
+    Extracts the value (e.g. ``/ipfs/<CID>``) and the TTL in seconds from a serialized IPNS record.
+
+    The TTL is limited by the validity of the record. The record signature is **not** verified.
+    """
+    entry = IpnsEntry.loads(record)
+    value, ttl, validity = entry.value, entry.ttl, entry.validity
+    if entry.data:
+        fields = dag_cbor.decode(entry.data)
+        if isinstance(fields, dict):
+            value = fields.get("Value", value)
+            ttl = fields.get("TTL", ttl)
+            validity = fields.get("Validity", validity)
+    if not value:
+        raise ValueError("IPNS record doesn't contain a value")
+
+    ttl_seconds = ttl / 1e9 if ttl is not None else None
+    if validity:
+        now = now or datetime.now(timezone.utc)
+        remaining = (parse_rfc3339(bytes(validity).decode()) - now).total_seconds()
+        if remaining <= 0:
+            raise ValueError("IPNS record has expired")
+        ttl_seconds = remaining if ttl_seconds is None else min(ttl_seconds, remaining)
+    return bytes(value).decode(), ttl_seconds
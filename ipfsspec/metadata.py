@@ -0,0 +1,115 @@
+"""
+Persistent store for metadata of immutable paths.
+"""
+
+import functools
+import json
+import os
+import sqlite3
+from typing import List, Optional, Union
+
+
+# connections inherited across fork must neither be used nor closed
+_inherited_connections = []
+
+# seconds to wait for a lock held by another process, the store is used on the event loop
+BUSY_TIMEOUT = 0.05
+
+
+def _skip_when_locked(method):
+    """
+    Lets ``method`` return ``None`` (a miss, or a skipped write) if the database is locked.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            return None
+    return wrapper
+
+
+class MetadataStore:
+    """
+    Stores results of ``info`` and ``ls`` in a SQLite database.
+
+    Entries are keyed by path, which must start with a CID (i.e. IPNS names
+    have to be resolved before), such that entries never become stale. The
+    database uses WAL mode, so it can be read by many processes while another
+    one writes to it. After ``fork``, the child opens its own connection.
+    As the store is a cache, a lock held by another process for longer than
+    ``BUSY_TIMEOUT`` counts as a miss instead of blocking the caller.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = os.getpid()
+
+    def __reduce__(self):
+        return MetadataStore, (self.path,)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            if self._connection is not None:
+                _inherited_connections.append(self._connection)
+                self._connection = None
+            self._pid = os.getpid()
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS info (path TEXT PRIMARY KEY, info TEXT NOT NULL)")
+                connection.execute("CREATE TABLE IF NOT EXISTS listing (path TEXT PRIMARY KEY, names TEXT NOT NULL)")
+            self._connection = connection
+        return self._connection
+
+    @_skip_when_locked
+    def get_info(self, path: str) -> Optional[dict]:
+        row = self.connection.execute("SELECT info FROM info WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    @_skip_when_locked
+    def put_info(self, path: str, info: dict) -> None:
+        with self.connection as connection:
+            connection.execute("INSERT OR REPLACE INTO info VALUES (?, ?)", (path, json.dumps(info)))
+
+    @_skip_when_locked
+    def get_listing(self, path: str, detail: bool = False) -> Optional[Union[List[str], List[dict]]]:
+        """
+        Stored listing of ``path``.
+
+        If ``detail`` is set, ``None`` is returned unless the info of each entry is stored as well.
+        """
+        row = self.connection.execute("SELECT names FROM listing WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        names = json.loads(row[0])
+        if not detail:
+            return names
+        entries = []
+        for name in names:
+            info = self.get_info(name)
+            if info is None:
+                return None
+            entries.append(info)
+        return entries
+
+    @_skip_when_locked
+    def put_listing(self, path: str, entries: Union[List[str], List[dict]]) -> None:
+        """
+        Stores a listing as returned by ``ls`` with or without details.
+        """
+        names = [entry["name"] if isinstance(entry, dict) else entry for entry in entries]
+        with self.connection as connection:
+            connection.execute("INSERT OR REPLACE INTO listing VALUES (?, ?)", (path, json.dumps(names)))
+            connection.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)",
+                                   [(entry["name"], json.dumps(entry)) for entry in entries if isinstance(entry, dict)])
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,151 @@
+"""
+Adaptive sequential read-ahead for UnixFS files.
+"""
+
+import asyncio
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from multiformats import CID
+
+from .dag import aiter_file_range, file_layout
+
+UNIT_BYTES = 2 * 2**20
+READAHEAD_BYTES = 64 * 2**20
+
+GetBlock = Callable[[CID, Optional[int]], Awaitable[bytes]]
+
+
+class ReadAhead:
+    """
+    Reads ranges of the UnixFS file ``cid`` and fetches the following parts in the background.
+
+    The file is split into units of at most ``unit_bytes`` (usually the leaves
+    of the file DAG), which are fetched concurrently using ``get_block``. For
+    sequential reads, the number of units fetched ahead (``window``) doubles
+    whenever a read has to wait for the network, a non-sequential read resets
+    it to a single unit. Units held by the read-ahead never exceed ``max_bytes``
+    (apart from the units of the current read).
+
+    All methods must be called from within the event loop of ``get_block``.
+    """
+
+    def __init__(self, get_block: GetBlock, cid: CID, size: int,
+                 max_bytes: int = READAHEAD_BYTES, unit_bytes: int = UNIT_BYTES):
+        self.get_block = get_block
+        self.size = size
+        self.max_bytes = max_bytes
+        self.unit_bytes = unit_bytes
+        self.window = 1
+        self._offsets: List[int] = []
+        self._units: List[Tuple[int, Union[CID, bytes]]] = []  # size and CID or inline data
+        self._unexpanded: List[Tuple[int, int, CID]] = [(0, size, cid)]
+        self._fetches: Dict[int, "asyncio.Future[bytes]"] = {}
+        self._position = 0
+
+    @property
+    def max_window(self) -> int:
+        return max(1, self.max_bytes // self.unit_bytes)
+
+    @property
+    def pending_bytes(self) -> int:
+        return sum(self._units[index][0] for index in self._fetches)
+
+    def _covered(self) -> int:
+        return self._offsets[-1] + self._units[-1][0] if self._units else 0
+
+    async def _discover(self, end: int = 0, count: int = 0) -> None:
+        """
+        Splits the file into units until they cover the file up to ``end`` and there are at least ``count`` units.
+        """
+        while self._unexpanded and (self._covered() < end or len(self._units) < count):
+            offset, size, cid = self._unexpanded.pop()
+            if size <= self.unit_bytes:
+                self._add_unit(offset, size, cid)
+                continue
+            inline, children = file_layout(cid, await self.get_block(cid, None))
+            self._add_unit(offset, len(inline), inline)
+            self._unexpanded.extend((offset + child_offset, child_size, child)
+                                    for child_offset, child_size, child in reversed(children))
+
+    def _add_unit(self, offset: int, size: int, source: Union[CID, bytes]) -> None:
+        if size > 0:
+            self._offsets.append(offset)
+            self._units.append((size, source))
+
+    def _fetch(self, index: int) -> "asyncio.Future[bytes]":
+        fetch = self._fetches.get(index)
+        if fetch is None:
+            size, source = self._units[index]
+            fetch = asyncio.ensure_future(self._fetch_unit(size, source))
+            # failed read-ahead which is never read must not be reported
+            fetch.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._fetches[index] = fetch
+        return fetch
+
+    async def _fetch_unit(self, size: int, source: Union[CID, bytes]) -> bytes:
+        if isinstance(source, bytes):
+            return source
+        return b"".join([piece async for piece in aiter_file_range(self.get_block, source, 0, size, size)])
+
+    def _forget_failed(self) -> None:
+        """
+        Drops fetches which failed or were cancelled, such that they are started again when needed.
+        """
+        for index, fetch in list(self._fetches.items()):
+            if fetch.done() and (fetch.cancelled() or fetch.exception() is not None):
+                del self._fetches[index]
+
+    def _drop(self, index: int) -> None:
+        fetch = self._fetches.pop(index, None)
+        if fetch is not None:
+            fetch.cancel()
+
+    async def read(self, start: int, end: int) -> bytes:
+        end = min(end, self.size)
+        if start >= end:
+            return b""
+        sequential = start == self._position
+        if not sequential:
+            self.window = 1
+
+        await self._discover(end=end)
+        self._forget_failed()
+        first = bisect_right(self._offsets, start) - 1
+        last = bisect_right(self._offsets, end - 1) - 1
+        for index in list(self._fetches):
+            if index < first or (not sequential and index > last):
+                self._drop(index)
+        needed = [self._fetch(index) for index in range(first, last + 1)]
+
+        if sequential:
+            await self._discover(count=last + 1 + self.window)
+            budget = self.max_bytes - self.pending_bytes
+            for index in range(last + 1, min(last + 1 + self.window, len(self._units))):
+                if index in self._fetches:
+                    continue
+                if self._units[index][0] > budget:
+                    break
+                budget -= self._units[index][0]
+                self._fetch(index)
+
+        stalled = not all(fetch.done() for fetch in needed)
+        try:
+            data = await asyncio.gather(*needed)
+        except Exception:
+            self._forget_failed()
+            raise
+        if stalled and sequential:
+            self.window = min(self.window * 2, self.max_window)
+
+        # the last unit may be needed by the next read as well
+        for index in range(first, last):
+            self._fetches.pop(index, None)
+        self._position = end
+        offset = self._offsets[first]
+        joined = data[0] if len(data) == 1 else b"".join(data)
+        return joined[start - offset:end - offset]
+
+    def close(self) -> None:
+        for index in list(self._fetches):
+            self._drop(index)
@@ -0,0 +1,368 @@
+"""
+Read-through caching trustless gateway.
+
+Answers ``format=car`` and ``format=raw`` requests (as well as plain file
+downloads) from a local cache of verified blocks. Blocks missing in the cache
+are fetched from an upstream gateway. Multiple ipfsspec clients (e.g. all
+nodes of a cluster) can point ``IPFS_GATEWAY`` to this server to share a
+single cache::
+
+    python -m ipfsspec.server --upstream http://127.0.0.1:8080 --cache-dir /scratch/ipfs-blocks --port 8081
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+
+from aiohttp import web
+from multiformats import CID
+
+from .async_ipfs import AsyncIPFSGateway, get_client, get_gateway
+from .blockcache import MemoryBlockCache, DirectoryBlockCache
+from .car import write_car_header, write_car_block
+from .dag import links, links_by_name, file_layout, node_info
+
+logger = logging.getLogger("ipfsspec")
+
+CAR_CONTENT_TYPE = "application/vnd.ipld.car; version=1; order=dfs; dups=n"
+RAW_CONTENT_TYPE = "application/vnd.ipld.raw"
+IMMUTABLE_HEADERS = {"Cache-Control": "public, max-age=29030400, immutable"}
+DAG_SCOPES = ("block", "entity", "all")
+# blocks a slow client may lag behind an upstream request shared with others
+FILL_QUEUE_BLOCKS = 16
+
+
+class _Fill:
+    """
+    Upstream CAR request, whose blocks are passed on to all subscribed queues.
+    """
+
+    def __init__(self):
+        self.queues = []
+        self.started = False
+        self.task = None
+
+
+class CachingGateway:
+    """
+    Trustless gateway which serves blocks from ``cache`` and fetches misses from ``upstream``.
+
+    Misses are fetched with as few upstream requests as possible: if a block
+    is missing, the part of the DAG which will be needed next (the path or the
+    subtree below the missing block) is requested as a single CAR. Its blocks
+    are sent on to the client while they are received, and concurrent misses
+    of the same blocks share a single upstream request.
+    """
+
+    def __init__(self, upstream, cache):
+        self.upstream = upstream
+        self.cache = cache
+        self.session = None
+        self._fills = {}
+        self._block_fetches = {}
+
+    async def start(self, app=None):
+        self.session = await get_client(unix_socket=self.upstream.unix_socket)
+
+    async def close(self, app=None):
+        if self.session is not None:
+            await self.session.close()
+
+    async def _run_fill(self, key, fill, path, dag_scope):
+        logger.debug("fetching %s (dag-scope=%s) from %s", path, dag_scope, self.upstream)
+        end = None
+        try:
+            async with self.upstream.iter_car(path, self.session, dag_scope=dag_scope) as blocks:
+                async for cid, data, _ in blocks:
+                    fill.started = True
+                    self.cache.put(cid, data)
+                    for queue in list(fill.queues):
+                        await queue.put((cid, data))
+        except asyncio.CancelledError:
+            end = ConnectionError(f"upstream request for {path} was cancelled")
+            # remaining clients fail right away, their queues must not block the end marker
+            for queue in fill.queues:
+                while not queue.empty():
+                    queue.get_nowait()
+            raise
+        except Exception as e:
+            end = e
+        finally:
+            if self._fills.get(key) is fill:
+                del self._fills[key]
+            for queue in list(fill.queues):
+                await queue.put(end)
+
+    async def stream(self, path, dag_scope):
+        """
+        Requests ``path`` upstream as CAR, stores the (hash-verified) blocks in the cache and yields them.
+
+        Requests for the same CAR share a single upstream request until its
+        first block has been received, blocks are passed on at the pace of
+        the slowest of them. The upstream request is cancelled once no one
+        is interested anymore.
+        """
+        key = (path, dag_scope)
+        fill = self._fills.get(key)
+        if fill is None or fill.started:
+            fill = self._fills[key] = _Fill()
+            fill.task = asyncio.ensure_future(self._run_fill(key, fill, path, dag_scope))
+        queue = asyncio.Queue(FILL_QUEUE_BLOCKS)
+        fill.queues.append(queue)
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            fill.queues.remove(queue)
+            # unblocks the fill if it waits for room in this queue
+            while not queue.empty():
+                queue.get_nowait()
+            if not fill.queues:
+                # requests arriving from now on start a new fill
+                if self._fills.get(key) is fill:
+                    del self._fills[key]
+                fill.task.cancel()
+
+    async def block(self, cid):
+        """
+        Block ``cid`` from the cache, misses are fetched upstream as single block.
+        """
+        data = self.cache.get(cid)
+        if data is not None:
+            return data
+        key = bytes(cid.digest)
+        fetch = self._block_fetches.get(key)
+        if fetch is None:
+            fetch = self._block_fetches[key] = asyncio.ensure_future(self._fetch_block(cid))
+            fetch.add_done_callback(lambda _: self._block_fetches.pop(key, None))
+        return await asyncio.shield(fetch)
+
+    async def _fetch_block(self, cid):
+        data = await self.upstream.block(cid, self.session)
+        self.cache.put(cid, data)
+        return data
+
+    async def resolve(self, path):
+        """
+        Returns the CIDs of all blocks along ``path``, the last one is the path target.
+        """
+        segments = path.split("/")
+        try:
+            cid = CID.decode(segments[0])
+        except Exception as e:
+            raise ValueError(f"Invalid root CID in path: {segments[0]}") from e
+        cids = [cid]
+        fetched = None
+        for segment in segments[1:]:
+            block = self.cache.get(cid)
+            if block is None and fetched is None:
+                # the path blocks are small, so they are fetched completely
+                fetched = {block_cid: data async for block_cid, data in self.stream(path, "block")}
+            if block is None:
+                block = fetched[cid] if cid in fetched else await self.block(cid)
+            child = links_by_name(cid, block).get(segment)
+            if child is None:
+                raise FileNotFoundError(f"Path segment '{segment}' not found in directory {cid}")
+            cid = child
+            cids.append(cid)
+        return cids
+
+    async def walk(self, root, dag_scope="all", seen=None):
+        """
+        Yields the ``(CID, block)`` pairs of the DAG below ``root`` within ``dag_scope`` in depth-first order.
+
+        If a block is missing in the cache, the subtree below it is requested
+        upstream (see :meth:`stream`) and its blocks are yielded while they are
+        received. If ``seen`` is given, blocks in it are skipped and yielded
+        blocks are added to it, otherwise repeated blocks are yielded again
+        (as needed for file contents).
+        """
+        walked = set()
+        pending = {}
+        stream = stream_root = None
+        stack = [root]
+        try:
+            while stack:
+                cid = stack.pop()
+                if seen is not None:
+                    if cid in seen:
+                        continue
+                    seen.add(cid)
+                data = pending.pop(cid, None)
+                if data is None:
+                    data = self.cache.get(cid)
+                if data is None and (cid in walked or (cid == root and dag_scope == "block")):
+                    # upstream doesn't send blocks twice within a CAR
+                    data = await self.block(cid)
+                while data is None:
+                    if stream is None:
+                        stream_root = cid
+                        stream = self.stream(str(cid), dag_scope if cid == root else "all")
+                    try:
+                        block_cid, block = await stream.__anext__()
+                    except StopAsyncIteration:
+                        stream = None
+                        if stream_root == cid:
+                            data = await self.block(cid)
+                        continue
+                    if block_cid == cid:
+                        data = block
+                    elif block_cid not in walked:
+                        pending[block_cid] = block
+                walked.add(cid)
+                yield cid, data
+                if cid == root and (dag_scope == "block" or (dag_scope == "entity" and not self._is_file(cid, data))):
+                    continue
+                stack.extend(reversed(links(cid, data)))
+        finally:
+            if stream is not None:
+                await stream.aclose()
+
+    async def iter_blocks(self, cids, dag_scope):
+        """
+        Yields the ``(CID, block)`` pairs of a CAR response for the resolved path ``cids``.
+
+        Blocks are ordered depth-first and each block is sent only once.
+        """
+        *path_cids, target = cids
+        seen = set()
+        for cid in path_cids:
+            if cid not in seen:
+                seen.add(cid)
+                yield cid, await self.block(cid)
+        async for cid, data in self.walk(target, dag_scope, seen):
+            yield cid, data
+
+    @staticmethod
+    def _is_file(cid, block):
+        try:
+            file_layout(cid, block)
+        except (IsADirectoryError, ValueError):
+            return False
+        return True
+
+    @staticmethod
+    async def iter_file(root, blocks):
+        """
+        Yields the contents of a UnixFS file from its ``root`` and the following ``blocks`` yielded by :meth:`walk`.
+        """
+        inline, _ = file_layout(*root)
+        if inline:
+            yield inline
+        async for cid, data in blocks:
+            inline, _ = file_layout(cid, data)
+            if inline:
+                yield inline
+
+    async def handle(self, request):
+        path = request.match_info["path"].strip("/")
+        accept = request.headers.get("Accept", "")
+        response_format = request.query.get("format")
+        if response_format is None:
+            if "application/vnd.ipld.car" in accept:
+                response_format = "car"
+            elif "application/vnd.ipld.raw" in accept:
+                response_format = "raw"
+        dag_scope = request.query.get("dag-scope", "all")
+        if dag_scope not in DAG_SCOPES:
+            raise web.HTTPBadRequest(text=f"invalid dag-scope: {dag_scope}")
+        if "entity-bytes" in request.query:
+            raise web.HTTPNotImplemented(text="entity-bytes is not supported")
+
+        try:
+            cids = await self.resolve(path)
+            if response_format == "raw":
+                data = await self.block(cids[-1])
+                return web.Response(body=data, content_type=RAW_CONTENT_TYPE, headers=IMMUTABLE_HEADERS)
+            elif response_format == "car":
+                return await self._stream(request, CAR_CONTENT_TYPE, self._iter_car(cids, dag_scope))
+            elif response_format is None:
+                target = cids[-1]
+                blocks = self.walk(target, "entity")
+                root = await blocks.__anext__()
+                info = node_info(path, *root)
+                if info["type"] != "file":
+                    await blocks.aclose()
+                    raise web.HTTPNotImplemented(text="only files can be downloaded without format")
+                return await self._stream(request, "application/octet-stream", self.iter_file(root, blocks), info["size"])
+            else:
+                raise web.HTTPBadRequest(text=f"unsupported format: {response_format}")
+        except FileNotFoundError as e:
+            raise web.HTTPNotFound(text=str(e))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+    async def _iter_car(self, cids, dag_scope):
+        buffer = io.BytesIO()
+        write_car_header(buffer, [cids[0]])
+        yield buffer.getvalue()
+        async for cid, data in self.iter_blocks(cids, dag_scope):
+            buffer = io.BytesIO()
+            write_car_block(buffer, cid, data)
+            yield buffer.getvalue()
+
+    @staticmethod
+    async def _stream(request, content_type, pieces, size=None):
+        response = web.StreamResponse(headers={"Content-Type": content_type, **IMMUTABLE_HEADERS})
+        if size is not None:
+            response.content_length = size
+        await response.prepare(request)
+        # errors after this point can't change the status anymore, they abort the connection,
+        # which clients detect as an incomplete response
+        async for piece in pieces:
+            await response.write(piece)
+        await response.write_eof()
+        return response
+
+
+GATEWAY_KEY = web.AppKey("gateway", CachingGateway)
+
+
+def make_app(upstream=None, cache=None):
+    """
+    Creates the aiohttp application of a caching gateway.
+
+    Parameters
+    ----------
+    upstream: AsyncIPFSGateway, optional
+        Gateway to fetch missing blocks from, defaults to the gateway configured via IPIP-280
+    cache: optional
+        Block cache, defaults to a :class:`ipfsspec.blockcache.MemoryBlockCache`
+    """
+    gateway = CachingGateway(upstream or get_gateway(), cache if cache is not None else MemoryBlockCache())
+    app = web.Application()
+    app[GATEWAY_KEY] = gateway
+    app.router.add_get("/ipfs/{path:.+}", gateway.handle)
+    app.on_startup.append(gateway.start)
+    app.on_cleanup.append(gateway.close)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="read-through caching IPFS trustless gateway")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--unix-socket", default=None, help="listen on this Unix domain socket instead of TCP")
+    parser.add_argument("--upstream", default=None, help="upstream gateway URL, defaults to the IPIP-280 configuration")
+    parser.add_argument("--cache-dir", default=None, help="store blocks in this directory instead of in memory")
+    parser.add_argument("--cache-size", type=int, default=2**30, help="maximum size of the in-memory cache in bytes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    upstream = AsyncIPFSGateway(args.upstream) if args.upstream else get_gateway()
+    if args.cache_dir:
+        cache = DirectoryBlockCache(args.cache_dir)
+    else:
+        cache = MemoryBlockCache(args.cache_size)
+    logger.info("serving blocks from %s, fetching misses from %s", args.cache_dir or "memory", upstream)
+    if args.unix_socket:
+        web.run_app(make_app(upstream, cache), path=args.unix_socket)
+    else:
+        web.run_app(make_app(upstream, cache), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,16 @@ import aiohttp
 
 class GatewayTracer:
     def __init__(self):
-        from collections import defaultdict
+        from collections import Counter, defaultdict
         self.samples = defaultdict(list)
+        self.connections = Counter()
 
     def make_trace_config(self):
         trace_config = aiohttp.TraceConfig()
         trace_config.on_request_start.append(self.on_request_start)
         trace_config.on_request_end.append(self.on_request_end)
+        trace_config.on_connection_create_end.append(self.on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.on_connection_reuseconn)
         return trace_config
 
     async def on_request_start(self, session, trace_config_ctx, params):
@@ -22,3 +25,9 @@ class GatewayTracer:
         status = params.response.status
         gateway = trace_config_ctx.trace_request_ctx.get("gateway", None)
         self.samples[gateway].append({"url": params.url, "method": params.method, "elapsed": elapsed, "status": status})
+
+    async def on_connection_create_end(self, session, trace_config_ctx, params):
+        self.connections["created"] += 1
+
+    async def on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self.connections["reused"] += 1
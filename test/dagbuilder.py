@@ -0,0 +1,30 @@
+"""
+Balanced UnixFS file DAGs for tests, built with the blocks of :mod:`ipfsspec.importer`.
+"""
+
+from ipfsspec.importer import leaf_block, node_block
+
+
+def import_blocks(content, layout):
+    """
+    Builds a balanced DAG level by level, returns the root CID, all blocks and the CIDs of the leaves.
+    """
+    blocks = {}
+    level = []
+    for offset in range(0, max(len(content), 1), layout.chunk_size):
+        chunk = content[offset:offset + layout.chunk_size]
+        cid, block = leaf_block(chunk, layout)
+        blocks[cid] = block
+        level.append((cid, len(chunk), len(block)))
+    leaves = {cid for cid, _, _ in level}
+    wrap = layout.wrap_single_leaf
+    while len(level) > 1 or wrap:
+        wrap = False
+        parents = []
+        for i in range(0, len(level), layout.max_links):
+            children = level[i:i + layout.max_links]
+            cid, block = node_block(children, layout)
+            blocks[cid] = block
+            parents.append((cid, sum(size for _, size, _ in children), len(block) + sum(tsize for _, _, tsize in children)))
+        level = parents
+    return level[0][0], blocks, leaves
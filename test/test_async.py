@@ -1,8 +1,14 @@
 import pytest
 import pytest_asyncio
 from ipfsspec.async_ipfs import AsyncIPFSGateway, AsyncIPFSFileSystem
+from ipfsspec.blockcache import MemoryBlockCache
+from ipfsspec.dag import iter_file_range
+from ipfsspec.tracing import GatewayTracer
 import asyncio
+import sqlite3
+import time
 import aiohttp
+from multiformats import CID
 
 TEST_ROOT = "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"
 REF_CONTENT = b'ipfsspec test data'
@@ -38,7 +44,9 @@ async def test_different_file_representations(filename, gw_host, session):
     info = await gw.info(path, session)
     assert info["size"] == len(REF_CONTENT)
     assert info["type"] == "file"
-    content = await gw.cat(path, session)
+    async with gw.iter_dag(path, session) as blocks:
+        dag = {cid: data async for cid, data in blocks}
+    content = b"".join(iter_file_range(dag.__getitem__, CID.decode(info["CID"])))
     assert content == REF_CONTENT
 
 
@@ -87,6 +95,26 @@ async def test_get_file(fs, tmp_path):
     assert open(tmp_path / "default", "rb").read() == REF_CONTENT
 
 
+@pytest.mark.asyncio
+async def test_get_skip_identical(fs, tmp_path, monkeypatch):
+    await fs._get(TEST_ROOT, str(tmp_path / "copy"), recursive=True)
+    (tmp_path / "copy" / "raw").write_bytes(REF_CONTENT.upper())
+    (tmp_path / "copy" / "multi").write_bytes(REF_CONTENT[:-1])
+
+    downloads = []
+    iter_file = fs._iter_file
+
+    def recording_iter_file(path, *args, **kwargs):
+        downloads.append(path.rpartition("/")[2])
+        return iter_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(fs, "_iter_file", recording_iter_file)
+    await fs._get(TEST_ROOT, str(tmp_path / "copy"), recursive=True, skip_identical=True)
+    assert sorted(downloads) == ["multi", "raw"]
+    for filename in TEST_FILENAMES:
+        assert (tmp_path / "copy" / filename).read_bytes() == REF_CONTENT
+
+
 @pytest.mark.asyncio
 async def test_exists(fs):
     res = await fs._exists(TEST_ROOT + "/default")
@@ -118,3 +146,330 @@ async def test_ls_multi_gw(fs, detail):
         assert res[0]["name"] == expected
     else:
         assert res == [expected]
+
+
+@pytest.mark.parametrize("subpath", ["", "/multi"])
+@pytest.mark.asyncio
+async def test_export_car(fs, tmp_path, subpath):
+    from ipfsspec import CARFileSystem
+    car_path = tmp_path / "export.car"
+    await fs._export_car(TEST_ROOT + subpath, car_path, write_index=True)
+    assert (tmp_path / "export.car.idx").exists()
+
+    carfs = CARFileSystem(car_path, write_index=False, skip_instance_cache=True)
+    (root,) = carfs.cars[0].roots
+    if subpath:
+        assert carfs.cat_file(str(root)) == REF_CONTENT
+    else:
+        assert str(root) == TEST_ROOT
+        for fn in TEST_FILENAMES:
+            assert carfs.cat_file(f"{root}/{fn}") == REF_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache(tmp_path):
+    AsyncIPFSFileSystem.clear_instance_cache()
+    metadata_cache = str(tmp_path / "metadata.sqlite")
+    fs = AsyncIPFSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr="http://127.0.0.1:8080", metadata_cache=metadata_cache)
+    listing = await fs._ls(TEST_ROOT, detail=True)
+    info = await fs._info(TEST_ROOT)
+
+    # a new instance must not need the gateway for the same requests
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr="http://127.0.0.1:1", metadata_cache=metadata_cache)
+    assert await fs._ls(TEST_ROOT, detail=True) == listing
+    assert await fs._ls(TEST_ROOT, detail=False) == [entry["name"] for entry in listing]
+    assert await fs._info(TEST_ROOT) == info
+    assert await fs._info(TEST_ROOT + "/raw") == listing[2]
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache_locked(tmp_path):
+    AsyncIPFSFileSystem.clear_instance_cache()
+    metadata_cache = str(tmp_path / "metadata.sqlite")
+    fs = AsyncIPFSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr="http://127.0.0.1:8080", metadata_cache=metadata_cache)
+    info = await fs._info(TEST_ROOT)
+
+    # another process holding the write lock must neither stall nor break requests
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr="http://127.0.0.1:8080", metadata_cache=metadata_cache)
+    other = sqlite3.connect(metadata_cache)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        start = time.monotonic()
+        assert len(await fs._ls(TEST_ROOT, detail=False)) == len(TEST_FILENAMES)
+        assert await fs._info(TEST_ROOT) == info
+        assert time.monotonic() - start < 5
+    finally:
+        other.rollback()
+        other.close()
+    assert fs.metadata.get_listing(TEST_ROOT) is None
+
+
+@pytest.mark.asyncio
+async def test_info_from_dircache(fs, monkeypatch):
+    listing = await fs._ls(TEST_ROOT, detail=True)
+
+    async def path_blocks(*args, **kwargs):
+        raise AssertionError("listed entries must not be requested again")
+
+    monkeypatch.setattr(AsyncIPFSGateway, "path_blocks", path_blocks)
+    assert await fs._ls(TEST_ROOT, detail=False) == [entry["name"] for entry in listing]
+    assert await fs._info(TEST_ROOT + "/raw") == listing[2]
+    assert await fs._exists(TEST_ROOT + "/raw")
+    assert await fs._isfile(TEST_ROOT + "/raw")
+    assert not await fs._isdir(TEST_ROOT + "/raw")
+    assert await fs._isdir(TEST_ROOT)
+    assert not await fs._exists(TEST_ROOT + "/missing")
+
+
+@pytest.mark.asyncio
+async def test_prefetch(fs, monkeypatch):
+    handle = fs.prefetch(TEST_ROOT)
+    assert await handle is handle
+    assert handle.done() and handle.progress == 1.0 and not handle.errors
+    assert handle.blocks == 24
+    await fs._ls(TEST_ROOT, detail=True)
+
+    def unavailable(*args, **kwargs):
+        raise AssertionError("prefetched blocks must not be requested again")
+
+    monkeypatch.setattr(AsyncIPFSGateway, "iter_car", unavailable)
+    monkeypatch.setattr(AsyncIPFSGateway, "block", unavailable)
+    for filename in TEST_FILENAMES:
+        assert await fs._cat_file(TEST_ROOT + "/" + filename) == REF_CONTENT
+        assert await fs._cat_file(TEST_ROOT + "/" + filename, start=3, end=-2) == REF_CONTENT[3:-2]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_limits(fs):
+    handle = await fs.prefetch([TEST_ROOT, TEST_ROOT + "/missing"], max_bytes=1)
+    assert handle.blocks == 1
+    assert list(handle.errors) == [TEST_ROOT + "/missing"]
+    assert handle.completed == 2
+
+
+@pytest.mark.asyncio
+async def test_open_async(fs):
+    async with await fs.open_async(TEST_ROOT + "/multi") as f:
+        assert await f.read(4) == REF_CONTENT[:4]
+        f.seek(9)
+        assert await f.read() == REF_CONTENT[9:]
+        assert await f.read() == b""
+
+    f = await fs.open_async(TEST_ROOT + "/raw_multi", block_size=5)
+    assert [chunk async for chunk in f] == [REF_CONTENT[i:i + 5] for i in range(0, len(REF_CONTENT), 5)]
+    await f.close()
+
+    with pytest.raises(IsADirectoryError):
+        await fs.open_async(TEST_ROOT)
+
+
+@pytest.mark.parametrize("cache_type", ["none", "bytes", "all"])
+@pytest.mark.asyncio
+async def test_open_async_cache_type(fs, cache_type):
+    async with await fs.open_async(TEST_ROOT + "/multi", cache_type=cache_type, cache_options={}) as f:
+        assert await f.read() == REF_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_hash_workers(get_client):
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, get_client=get_client, hash_workers=2, hash_threshold=1)
+    executor = fs.car_options["executor"]
+    submitted = []
+    submit = executor.submit
+    executor.submit = lambda *args, **kwargs: submitted.append(args) or submit(*args, **kwargs)
+
+    assert await fs._ls(TEST_ROOT, detail=False) == [TEST_ROOT + fs.sep + fn for fn in TEST_FILENAMES]
+    for filename in TEST_FILENAMES:
+        assert await fs._cat(TEST_ROOT + "/" + filename) == REF_CONTENT
+    assert submitted
+
+
+@pytest.mark.asyncio
+async def test_shared_session():
+    AsyncIPFSFileSystem.clear_instance_cache()
+    tracer = GatewayTracer()
+    client_kwargs = {"limit_per_host": 4, "trace_configs": [tracer.make_trace_config()]}
+    fs1 = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080", client_kwargs=client_kwargs, hash_threshold=1)
+    fs2 = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080", client_kwargs=client_kwargs, hash_threshold=2)
+    fs3 = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080")
+    assert fs1 is not fs2
+    assert await fs1.set_session() is await fs2.set_session()
+    assert await fs3.set_session() is not await fs1.set_session()
+
+    paths = [TEST_ROOT + "/" + filename for filename in TEST_FILENAMES] * 4
+    await asyncio.gather(*(fs._info(path) for fs in (fs1, fs2) for path in paths))
+    assert tracer.connections["created"] <= 4
+    assert tracer.connections["reused"] >= 2 * len(paths) - 4
+
+
+def test_shared_client_loops():
+    from ipfsspec.async_ipfs import _client_session, _shared_clients, get_shared_client
+
+    async def use_client():
+        client = await get_shared_client()
+        assert client is await get_shared_client()
+        return client
+
+    clients = [asyncio.run(use_client()) for _ in range(3)]
+    assert all(_client_session(client).closed for client in clients)
+    assert not any(loop.is_closed() for loop in _shared_clients)
+
+    loop = asyncio.new_event_loop()
+    session = _client_session(loop.run_until_complete(use_client()))
+    loop.close()
+    asyncio.run(use_client())
+    assert loop not in _shared_clients
+    assert session.connector is None or session.connector.closed
+
+
+def test_cached_instance_on_new_loop():
+    AsyncIPFSFileSystem.clear_instance_cache()
+
+    async def cat():
+        fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080")
+        return fs, await fs._cat_file(TEST_ROOT + "/multi")
+
+    fs1, content1 = asyncio.run(cat())
+    fs2, content2 = asyncio.run(cat())
+    assert fs1 is fs2
+    assert content1 == content2 == REF_CONTENT
+    assert len(fs1._sessions) == 1
+
+
+@pytest.fixture
+def gateways(monkeypatch):
+    """
+    A gateway which breaks off CAR responses after the first verified blocks, followed by a good one.
+    """
+    from contextlib import asynccontextmanager
+    from ipfsspec.async_ipfs import get_gateways
+    from ipfsspec.car import VerificationError
+    bad, good = get_gateways("ipfs", ["http://localhost:8080", "http://127.0.0.1:8080"])
+    monkeypatch.setattr(bad, "quarantined_until", 0.0)
+    monkeypatch.setattr(good, "quarantined_until", 0.0)
+    iter_car = bad.iter_car
+
+    @asynccontextmanager
+    async def corrupted_iter_car(path, *args, **kwargs):
+        async with iter_car(path, *args, **kwargs) as blocks:
+            async def corrupted():
+                count = 0
+                async for block in blocks:
+                    if count == 3:
+                        raise VerificationError("CAR is corrupted")
+                    count += 1
+                    yield block
+            yield corrupted()
+
+    async def corrupted_block(cid, session):
+        raise VerificationError(f"Block '{cid}' could not be verified")
+
+    good.requests = []
+    good_iter_car = good.iter_car
+
+    def recording_iter_car(path, session, dag_scope="all", **kwargs):
+        good.requests.append((path, dag_scope))
+        return good_iter_car(path, session, dag_scope=dag_scope, **kwargs)
+
+    monkeypatch.setattr(bad, "iter_car", corrupted_iter_car)
+    monkeypatch.setattr(bad, "block", corrupted_block)
+    monkeypatch.setattr(good, "iter_car", recording_iter_car)
+    return bad, good
+
+
+@pytest.mark.asyncio
+async def test_failover_keeps_verified_blocks(gateways):
+    bad, good = gateways
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr=[bad.url, good.url], quarantine_seconds=600)
+    handle = await fs.prefetch(TEST_ROOT)
+    assert handle.done() and not handle.errors
+    assert not bad.available and fs.gateway is good
+    assert (TEST_ROOT, "all") not in good.requests and len(good.requests) > 1
+    assert fs._missing_subtrees(CID.decode(TEST_ROOT)) == []
+
+    for filename in TEST_FILENAMES:
+        assert await fs._cat_file(TEST_ROOT + "/" + filename) == REF_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_failover_streaming_read(gateways):
+    bad, good = gateways
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr=[bad.url, good.url])
+    info = await fs._info(TEST_ROOT + "/multi")
+    assert bad.available  # info is fetched with a single block
+
+    assert await fs._cat_file(TEST_ROOT + "/multi") == REF_CONTENT
+    assert not bad.available
+    assert all(info["CID"] not in path for path, _ in good.requests)  # the verified root block is kept
+
+    # quarantined gateways are still used as a last resort
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr=[good.url, "http://127.0.0.1:1"], client_kwargs={"retry_attempts": 1})
+    good.quarantine(600)
+    assert await fs._cat_file(TEST_ROOT + "/raw") == REF_CONTENT
+    assert fs.gateways[1].available is False
+
+
+@pytest.mark.parametrize("length", [0, 100])
+@pytest.mark.asyncio
+async def test_failover_truncated_response(monkeypatch, length):
+    from contextlib import asynccontextmanager
+    from pathlib import Path
+    from ipfsspec.async_ipfs import get_gateways
+    from ipfsspec.car import aread_car
+    bad, good = get_gateways("ipfs", ["http://localhost:8080", "http://127.0.0.1:8080"])
+    monkeypatch.setattr(bad, "quarantined_until", 0.0)
+    monkeypatch.setattr(good, "quarantined_until", 0.0)
+    car_data = (Path(__file__).parent / "testdata.car").read_bytes()[:length]
+
+    @asynccontextmanager
+    async def truncated_iter_car(path, session, dag_scope="all", **car_options):
+        reader = asyncio.StreamReader()
+        reader.feed_data(car_data)
+        reader.feed_eof()
+        _, blocks = await aread_car(reader, **car_options)
+        yield blocks
+
+    monkeypatch.setattr(bad, "iter_car", truncated_iter_car)
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr=[bad.url, good.url])
+    assert await fs._cat_file(TEST_ROOT + "/multi") == REF_CONTENT
+    assert not bad.available
+    # failover replaces retries on the same gateway
+    assert (await fs.set_session()).retry_options.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_request_count(tmp_path):
+    AsyncIPFSFileSystem.clear_instance_cache()
+    tracer = GatewayTracer()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080",
+                             client_kwargs={"trace_configs": [tracer.make_trace_config()]})
+
+    async def requests(coro):
+        before = len(tracer.samples["http://127.0.0.1:8080"])
+        await coro
+        return [str(sample["url"]) for sample in tracer.samples["http://127.0.0.1:8080"][before:]]
+
+    # the verified target block of the info request is kept
+    assert len(await requests(fs._cat_file(TEST_ROOT + "/raw"))) == 1
+    assert len(await requests(fs._cat_file(TEST_ROOT + "/multi"))) == 2
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080",
+                             client_kwargs={"trace_configs": [tracer.make_trace_config()]})
+    assert len(await requests(fs._get_file(TEST_ROOT + "/raw", tmp_path / "raw"))) == 1
+
+    # plain reads stream the missing blocks without filling the block cache
+    AsyncIPFSFileSystem.clear_instance_cache()
+    fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http://127.0.0.1:8080", block_cache=MemoryBlockCache(),
+                             client_kwargs={"trace_configs": [tracer.make_trace_config()]})
+    assert len(await requests(fs._get_file(TEST_ROOT + "/raw_multi", tmp_path / "raw_multi", chunk_size=4))) == 2
+    assert (tmp_path / "raw_multi").read_bytes() == REF_CONTENT
+    assert len(fs.block_cache) == 2  # the path blocks of the info request
+    assert await fs._cat_file(TEST_ROOT + "/raw_multi", 3, 5) == REF_CONTENT[3:5]
+    assert len(fs.block_cache) == 2
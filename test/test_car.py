@@ -0,0 +1,143 @@
+"""Test CAR decoding using real CAR test data"""
+
+import asyncio
+import io
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from ipfsspec.car import read_car, aread_car, CARIndex, MappedCAR, TruncatedCARError
+
+CARV2_PRAGMA = bytes.fromhex("0aa16776657273696f6e02")
+
+
+@pytest.fixture
+def car_data():
+    with open(Path(__file__).parent / "testdata.car", "rb") as f:
+        return f.read()
+
+
+def make_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def collect(data, **kwargs):
+    roots, blocks = await aread_car(make_reader(data), **kwargs)
+    return roots, [block async for block in blocks]
+
+
+@pytest.mark.parametrize("hash_threshold", [0, 20, 2**20])
+@pytest.mark.asyncio
+async def test_aread_car_matches_read_car(car_data, hash_threshold):
+    roots, blocks = read_car(car_data)
+    expected = list(blocks)
+
+    with ThreadPoolExecutor(2) as executor:
+        aroots, ablocks = await collect(car_data, executor=executor, hash_threshold=hash_threshold, max_pending=3)
+
+    assert aroots == roots
+    assert ablocks == expected
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+@pytest.mark.asyncio
+async def test_aread_car_detects_corruption(car_data, use_executor):
+    # the raw block containing "ipfsspec test data" is the 13th block
+    _, blocks = read_car(car_data)
+    location = list(blocks)[12][2]
+    corrupted = bytearray(car_data)
+    corrupted[location.payload_offset] ^= 0xff
+
+    with ThreadPoolExecutor(2) as executor:
+        with pytest.raises(ValueError, match="CAR is corrupted"):
+            await collect(bytes(corrupted), executor=executor if use_executor else None, hash_threshold=0)
+
+
+@pytest.mark.parametrize("length", [0, 1, 30, 100, -1])
+@pytest.mark.asyncio
+async def test_aread_car_detects_truncation(car_data, length):
+    # empty, within the header varint, within the header, within the first block, within the last block
+    with pytest.raises(TruncatedCARError):
+        await collect(car_data[:length])
+
+
+def make_carv2(car_data, index_sorted=False, with_index=True):
+    _, blocks = read_car(car_data)
+    index = CARIndex.from_entries((cid, location.offset) for cid, _, location in blocks)
+    if index_sorted:
+        (widths,) = index.buckets.values()
+        index = CARIndex({None: widths})
+    index_data = io.BytesIO()
+    index.dump(index_data)
+
+    data_offset = len(CARV2_PRAGMA) + 40 + 5  # some padding between header and payload
+    index_offset = data_offset + len(car_data) + 3 if with_index else 0
+    header = bytes(16) + struct.pack("<QQQ", data_offset, len(car_data), index_offset)
+    return (CARV2_PRAGMA + header + bytes(5) + car_data
+            + (bytes(3) + index_data.getvalue() if with_index else b""))
+
+
+@pytest.mark.asyncio
+async def test_read_carv2(car_data):
+    roots, blocks = read_car(car_data)
+    expected = [(cid, data) for cid, data, _ in blocks]
+    v2_data = make_carv2(car_data)
+
+    v2_roots, v2_blocks = read_car(v2_data)
+    v2_blocks = list(v2_blocks)
+    assert v2_roots == roots
+    assert [(cid, data) for cid, data, _ in v2_blocks] == expected
+    for cid, data, location in v2_blocks:
+        assert v2_data[location.payload_offset:location.payload_offset + location.payload_size] == data
+
+    v2_roots, v2_blocks = await collect(v2_data)
+    assert v2_roots == roots
+    assert [(cid, data) for cid, data, _ in v2_blocks] == expected
+
+
+@pytest.mark.parametrize("index_sorted", [False, True])
+def test_mapped_carv2_embedded_index(car_data, tmp_path, index_sorted):
+    path = tmp_path / "testdata.car"
+    path.write_bytes(make_carv2(car_data, index_sorted=index_sorted))
+
+    car = MappedCAR(path)
+    assert not (tmp_path / "testdata.car.idx").exists()
+    assert len(car) == 24
+    _, blocks = read_car(car_data)
+    for cid, data, _ in blocks:
+        assert bytes(car[cid]) == data
+
+
+def test_mapped_carv2_foreign_index(car_data, tmp_path):
+    # testdata_v2.car wraps testdata.car as go-car's WrapV1 does and appends a
+    # MultihashIndexSorted index in go-car's serialization, built without CARIndex
+    v2_data = (Path(__file__).parent / "testdata_v2.car").read_bytes()
+    path = tmp_path / "testdata_v2.car"
+    path.write_bytes(v2_data)
+
+    car = MappedCAR(path)
+    assert not (tmp_path / "testdata_v2.car.idx").exists()
+    assert car.v2_header.index_offset == 51 + len(car_data)
+    assert len(car) == 24
+    _, blocks = read_car(car_data)
+    for cid, data, _ in blocks:
+        assert bytes(car[cid]) == data
+
+    dumped = io.BytesIO()
+    car.index.dump(dumped)
+    assert dumped.getvalue() == v2_data[car.v2_header.index_offset:]
+
+
+def test_mapped_carv2_without_index(car_data, tmp_path):
+    path = tmp_path / "testdata.car"
+    path.write_bytes(make_carv2(car_data, with_index=False))
+
+    car = MappedCAR(path)
+    assert (tmp_path / "testdata.car.idx").exists()
+    _, blocks = read_car(car_data)
+    for cid, data, _ in blocks:
+        assert bytes(car[cid]) == data
@@ -0,0 +1,72 @@
+import shutil
+from pathlib import Path
+
+import fsspec
+import pytest
+from ipfsspec import CARFileSystem
+from ipfsspec.car import MappedCAR, read_car
+
+TEST_ROOT = "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"
+REF_CONTENT = b'ipfsspec test data'
+TEST_FILENAMES = ["default", "multi", "raw", "raw_multi", "write"]
+
+
+@pytest.fixture
+def car_path(tmp_path):
+    path = tmp_path / "testdata.car"
+    shutil.copy(Path(__file__).parent / "testdata.car", path)
+    return path
+
+
+@pytest.fixture
+def fs(car_path):
+    CARFileSystem.clear_instance_cache()
+    return fsspec.filesystem("car", car_path=str(car_path))
+
+
+def test_sidecar_index(car_path):
+    car = MappedCAR(car_path)
+    assert Path(str(car_path) + ".idx").exists()
+    reloaded = MappedCAR(car_path)
+
+    _, blocks = read_car(car_path.read_bytes())
+    for cid, data, _ in blocks:
+        assert car.index.find(cid) == reloaded.index.find(cid)
+        assert bytes(reloaded[cid]) == data
+
+
+def test_ls(fs):
+    res = fs.ls(TEST_ROOT, detail=False)
+    assert res == [TEST_ROOT + fs.sep + fn for fn in TEST_FILENAMES]
+    res = fs.ls(TEST_ROOT, detail=True)
+    assert [r["name"] for r in res] == [TEST_ROOT + fs.sep + fn for fn in TEST_FILENAMES]
+    assert all([r["size"] == len(REF_CONTENT) for r in res])
+
+
+@pytest.mark.parametrize("filename", TEST_FILENAMES)
+def test_cat_file(fs, filename):
+    path = f"car://{TEST_ROOT}/{filename}"
+    assert fs.cat_file(path) == REF_CONTENT
+    assert fs.cat_file(path, start=3, end=7) == REF_CONTENT[3:7]
+    assert fs.cat_file(path, start=-5) == REF_CONTENT[-5:]
+    with fs.open(path) as f:
+        f.seek(5)
+        assert f.read(4) == REF_CONTENT[5:9]
+
+
+def test_missing(fs):
+    assert fs.exists(TEST_ROOT + "/missing") is False
+    assert fs.isdir(TEST_ROOT) is True
+    assert fs.isfile(TEST_ROOT + "/raw") is True
+
+
+def test_corrupted_block(car_path):
+    _, blocks = read_car(car_path.read_bytes())
+    location = list(blocks)[12][2]
+    corrupted = bytearray(car_path.read_bytes())
+    corrupted[location.payload_offset] ^= 0xff
+    car_path.write_bytes(corrupted)
+
+    fs = CARFileSystem(car_path, skip_instance_cache=True)
+    with pytest.raises(ValueError, match="CAR is corrupted"):
+        fs.cat_file(TEST_ROOT + "/raw")
@@ -0,0 +1,34 @@
+"""Import-time benchmark, guards against pulling heavy dependencies into the fsspec entry point"""
+
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["aiohttp", "aiohttp_retry", "multiformats", "dag_cbor", "pure_protobuf", "sqlite3"]
+
+SCRIPT = """
+import json, sys, time
+import fsspec
+start = time.perf_counter()
+import ipfsspec
+fs = fsspec.filesystem("ipfs", gateway_addr="http://127.0.0.1:1")
+fs.dircache["QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"] = [
+    {"name": "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd/raw", "CID": "bafkreie2aqh6bnx6ulgpmzhpvnbe2tp2egf5xkkdcf2ntxc5xvbomp3ahi", "type": "file", "size": 18},
+]
+assert fs.ukey("QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd/raw") == "bafkreie2aqh6bnx6ulgpmzhpvnbe2tp2egf5xkkdcf2ntxc5xvbomp3ahi"
+ipfsspec_time = time.perf_counter() - start
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+start = time.perf_counter()
+for name in HEAVY_MODULES:
+    __import__(name)
+heavy_time = time.perf_counter() - start
+print(json.dumps({"loaded": loaded, "ipfsspec_time": ipfsspec_time, "heavy_time": heavy_time}))
+"""
+
+
+def test_import_is_lazy():
+    script = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n" + SCRIPT
+    result = json.loads(subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout)
+    assert result["loaded"] == []
+    assert result["ipfsspec_time"] < result["heavy_time"]
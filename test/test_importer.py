@@ -0,0 +1,85 @@
+import random
+from pathlib import Path
+
+import pytest
+from dagbuilder import import_blocks
+from multiformats import CID
+from ipfsspec import unixfsv1
+from ipfsspec.car import read_car
+from ipfsspec.importer import ImportLayout, afile_cid, infer_layout
+
+CHUNK_SIZE = 1000
+MAX_LINKS = 4
+REF_CONTENT = b"ipfsspec test data"
+
+
+@pytest.mark.parametrize("size,depth", [(3500, 1), (10500, 2), (40123, 3)])
+@pytest.mark.parametrize("raw_leaves,cid_version", [(False, 0), (True, 0), (True, 1)])
+@pytest.mark.asyncio
+async def test_reproduce_remote_dag(tmp_path, size, depth, raw_leaves, cid_version):
+    content = random.Random(size).randbytes(size)
+    layout = ImportLayout(CHUNK_SIZE, raw_leaves, cid_version, "sha2-256", max_links=MAX_LINKS, wrap_single_leaf=True)
+    root, blocks, leaves = import_blocks(content, layout)
+    requested = []
+
+    async def get_block(cid, size):
+        requested.append(cid)
+        return blocks[cid]
+
+    inferred = await infer_layout(get_block, root, size)
+    assert (inferred.chunk_size, inferred.raw_leaves, inferred.cid_version) == (CHUNK_SIZE, raw_leaves, cid_version)
+    assert inferred.max_links == (MAX_LINKS if depth > 1 else 174)
+    assert len(requested) == depth and not leaves & set(requested)
+
+    local = tmp_path / "file"
+    local.write_bytes(content)
+    assert await afile_cid(local, size, inferred) == root
+    local.write_bytes(content[:-1] + b"\0")
+    assert await afile_cid(local, size, inferred) != root
+
+
+@pytest.mark.asyncio
+async def test_single_block_files(tmp_path):
+    local = tmp_path / "empty"
+    local.write_bytes(b"")
+    assert str(await afile_cid(local, 0, ImportLayout(256 * 1024, False, 0, "sha2-256"))) == "QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH"
+
+    for raw_leaves in (False, True):
+        layout = ImportLayout(CHUNK_SIZE, raw_leaves, 1, "sha2-256")
+        root, blocks, _ = import_blocks(b"small", layout)
+        assert len(blocks) == 1
+        local.write_bytes(b"small")
+        assert await afile_cid(local, 5, layout) == root
+
+
+@pytest.fixture
+def testdata():
+    """
+    Blocks of test/testdata.car, as written by Kubo (see create_test_files.py), and the CIDs of its files.
+    """
+    with open(Path(__file__).parent / "testdata.car", "rb") as f:
+        (root,), blocks = read_car(f.read())
+        blocks = {cid: block for cid, block, _ in blocks}
+    files = {link.Name: CID.decode(link.Hash) for link in unixfsv1.PBNode.loads(blocks[root]).Links}
+    return files, blocks
+
+
+@pytest.mark.parametrize("max_links", [174, 2])
+@pytest.mark.parametrize("name,raw_leaves", [("multi", False), ("raw_multi", True)])
+@pytest.mark.asyncio
+async def test_reproduce_testdata(tmp_path, testdata, name, raw_leaves, max_links):
+    files, real_blocks = testdata
+    layout = ImportLayout(2, raw_leaves, 0, "sha2-256", max_links=max_links, wrap_single_leaf=True)
+    root, blocks, leaves = import_blocks(REF_CONTENT, layout)
+    assert leaves and all(real_blocks.get(cid) == blocks[cid] for cid in leaves)
+    if max_links == 174:
+        assert root == files[name] and blocks.items() <= real_blocks.items()
+
+    async def get_block(cid, size):
+        return blocks[cid]
+
+    inferred = await infer_layout(get_block, root, len(REF_CONTENT))
+    assert (inferred.chunk_size, inferred.raw_leaves, inferred.max_links) == (2, raw_leaves, max_links)
+    local = tmp_path / "file"
+    local.write_bytes(REF_CONTENT)
+    assert await afile_cid(local, len(REF_CONTENT), inferred) == root
@@ -17,3 +17,17 @@ def test_different_file_representations(filename):
     assert fs.size(f"{TEST_ROOT}/{filename}") == len(REF_CONTENT)
     with fsspec.open(f"ipfs://{TEST_ROOT}/{filename}") as f:
         assert f.read() == REF_CONTENT
+
+
+@pytest.mark.parametrize("cache_type", ["none", "bytes", "readahead"])
+def test_open_cache_type(cache_type):
+    with fsspec.open(f"ipfs://{TEST_ROOT}/multi", cache_type=cache_type) as f:
+        assert f.read(4) == REF_CONTENT[:4]
+        assert f.read() == REF_CONTENT[4:]
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_open_directory():
+    fs = fsspec.filesystem("ipfs")
+    with pytest.raises(IsADirectoryError):
+        fs.open(TEST_ROOT)
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timezone
+
+import dag_cbor
+import pytest
+import pytest_asyncio
+from ipfsspec.async_ipfs import AsyncIPFSGateway, AsyncIPNSFileSystem
+from ipfsspec.ipns import IpnsEntry, parse_ipns_record
+
+TEST_ROOT = "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"
+REF_CONTENT = b'ipfsspec test data'
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_parse_v1_record():
+    record = IpnsEntry(value=f"/ipfs/{TEST_ROOT}".encode(), ttl=30 * 10**9,
+                       validityType=0, validity=b"2025-01-02T00:00:00.123456789Z").dumps()
+    assert parse_ipns_record(record, now=NOW) == (f"/ipfs/{TEST_ROOT}", 30.0)
+
+
+def test_parse_v2_record():
+    data = dag_cbor.encode({"Value": f"/ipfs/{TEST_ROOT}/raw".encode(), "TTL": 10**12,
+                            "Validity": b"2025-01-01T00:01:00Z", "ValidityType": 0, "Sequence": 3})
+    record = IpnsEntry(value=b"/ipfs/outdated", ttl=1, data=data).dumps()
+    # TTL is limited by the validity of the record
+    assert parse_ipns_record(record, now=NOW) == (f"/ipfs/{TEST_ROOT}/raw", 60.0)
+
+
+def test_parse_expired_record():
+    record = IpnsEntry(value=f"/ipfs/{TEST_ROOT}".encode(), validity=b"2024-12-31T23:59:59Z").dumps()
+    with pytest.raises(ValueError, match="expired"):
+        parse_ipns_record(record, now=NOW)
+
+
+@pytest_asyncio.fixture
+async def fs():
+    AsyncIPNSFileSystem.clear_instance_cache()  # avoid reusing old event loop
+    return AsyncIPNSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr="http://127.0.0.1:8080")
+
+
+@pytest.mark.asyncio
+async def test_name_is_resolved_once(fs, monkeypatch):
+    resolutions = []
+
+    async def resolve(self, name, session):
+        resolutions.append(name)
+        await asyncio.sleep(0.01)
+        return f"/ipfs/{TEST_ROOT}", 60.0
+
+    monkeypatch.setattr(AsyncIPFSGateway, "resolve", resolve)
+
+    contents = await asyncio.gather(*(fs._cat_file(f"ipns://testname/{fn}") for fn in ["default", "raw", "multi"] * 5))
+    assert contents == [REF_CONTENT] * 15
+    assert resolutions == ["testname"]
+
+    res = await fs._ls("testname", detail=False)
+    assert "testname/raw" in res
+    info = await fs._info("testname/raw")
+    assert info["name"] == "testname/raw"
+    assert resolutions == ["testname"]
+
+
+@pytest.mark.asyncio
+async def test_resolution_expires(fs, monkeypatch):
+    resolutions = []
+
+    async def resolve(self, name, session):
+        resolutions.append(name)
+        return f"/ipfs/{TEST_ROOT}", 0.0
+
+    monkeypatch.setattr(AsyncIPFSGateway, "resolve", resolve)
+
+    await fs._info("testname/raw")
+    await fs._info("testname/raw")
+    assert resolutions == ["testname", "testname"]
+
+
+@pytest.mark.parametrize("names", [{"a": "a"}, {"a": "b", "b": "a"}, {f"n{i}": f"n{i + 1}" for i in range(40)}])
+@pytest.mark.asyncio
+async def test_resolution_loops(fs, monkeypatch, names):
+    async def resolve(self, name, session):
+        return f"/ipns/{names[name]}", 60.0
+
+    monkeypatch.setattr(AsyncIPFSGateway, "resolve", resolve)
+
+    # concurrent lookups of names of the same cycle must not wait for each other
+    results = await asyncio.wait_for(asyncio.gather(*(fs._info(name) for name in list(names)[:2]),
+                                                    return_exceptions=True), 5)
+    assert all(isinstance(result, FileNotFoundError) for result in results)
@@ -5,6 +5,7 @@ from pathlib import Path
 from multiformats import CID
 from ipfsspec.async_ipfs import AsyncIPFSGateway
 from ipfsspec.car import read_car
+from ipfsspec.dag import SubtreeVerifier
 
 
 # Test data from test/testdata.car
@@ -126,3 +127,47 @@ def test_verify_merkle_path_missing_intermediate_block(test_car):
 
     with pytest.raises(FileNotFoundError, match="Child block .* not found"):
         AsyncIPFSGateway._verify_merkle_path(f"{root_cid}/default", blocks)
+
+
+def test_subtree_verifier_complete_dag(test_car):
+    """Test that the complete DAG in CAR order is accepted"""
+    root_cid, blocks = test_car
+
+    verifier = SubtreeVerifier(str(root_cid))
+    assert all(verifier.add(cid, data) for cid, data in blocks.items())
+    verifier.finish()
+    assert verifier.root == root_cid
+
+
+def test_subtree_verifier_path_blocks(test_car):
+    """Test that blocks along the path are not part of the subtree"""
+    root_cid, blocks = test_car
+    raw_cid = CID.decode("bafkreibauudqsswbcktzrs5bwozj3cllhme56jlj23op4lwgmsucpv222q")
+
+    verifier = SubtreeVerifier(f"{root_cid}/raw")
+    assert verifier.add(root_cid, blocks[root_cid]) is False
+    assert verifier.root == raw_cid
+    assert verifier.add(raw_cid, blocks[raw_cid]) is True
+    verifier.finish()
+
+
+def test_subtree_verifier_unexpected_block(test_car):
+    """Test that blocks which are not part of the DAG are rejected"""
+    root_cid, blocks = test_car
+    raw_cid = CID.decode("bafkreibauudqsswbcktzrs5bwozj3cllhme56jlj23op4lwgmsucpv222q")
+
+    verifier = SubtreeVerifier(f"{root_cid}/default")
+    verifier.add(root_cid, blocks[root_cid])
+    with pytest.raises(ValueError, match="unexpected block"):
+        verifier.add(raw_cid, blocks[raw_cid])
+
+
+def test_subtree_verifier_incomplete(test_car):
+    """Test that a missing block is detected"""
+    root_cid, blocks = test_car
+
+    verifier = SubtreeVerifier(str(root_cid))
+    for cid, data in list(blocks.items())[:-1]:
+        verifier.add(cid, data)
+    with pytest.raises(ValueError, match="incomplete"):
+        verifier.finish()
@@ -0,0 +1,78 @@
+import multiprocessing
+import pickle
+
+import pytest
+from multiformats import CID
+from ipfsspec.async_ipfs import AsyncIPFSFileSystem
+from ipfsspec.blockcache import MemoryBlockCache
+
+TEST_ROOT = "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"
+REF_CONTENT = b'ipfsspec test data'
+
+
+@pytest.fixture
+def fs(tmp_path):
+    AsyncIPFSFileSystem.clear_instance_cache()
+    return AsyncIPFSFileSystem(gateway_addr="http://127.0.0.1:8080", metadata_cache=str(tmp_path / "metadata.sqlite"))
+
+
+def cat(fs, path):
+    return fs.cat_file(path)
+
+
+def ls(fs, path):
+    return fs.ls(path, detail=False)
+
+
+def test_pickle_contains_configuration_only(fs):
+    block_cache = MemoryBlockCache(2**20)
+    block_cache.put(CID.decode(TEST_ROOT), b"data")
+    assert pickle.loads(pickle.dumps(block_cache)).max_bytes == 2**20
+    assert len(pickle.loads(pickle.dumps(block_cache))) == 0
+
+    assert fs.cat_file(TEST_ROOT + "/raw") == REF_CONTENT
+    data = pickle.dumps(fs)
+    assert b"sqlite" in data and len(data) < 1000
+    assert pickle.loads(data) is fs  # same configuration within a process uses the cached instance
+
+
+def test_spawned_worker(fs):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        assert pool.apply(cat, (fs, TEST_ROOT + "/multi")) == REF_CONTENT
+
+
+def run_in_child(conn, func, *args):
+    try:
+        conn.send(func(*args))
+    except Exception as e:
+        conn.send(e)
+
+
+def run_forked(func, *args):
+    """
+    Runs ``func`` in a forked process, which uses the inherited (not unpickled) arguments.
+    """
+    context = multiprocessing.get_context("fork")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=run_in_child, args=(child_conn, func, *args))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+def test_forked_worker(fs):
+    # create session, loop and database connection before forking
+    assert fs.cat_file(TEST_ROOT + "/raw") == REF_CONTENT
+    assert len(fs.ls(TEST_ROOT)) == 5
+
+    assert run_forked(cat, fs, TEST_ROOT + "/default") == REF_CONTENT
+    assert run_forked(ls, fs, TEST_ROOT) == fs.ls(TEST_ROOT, detail=False)
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        assert pool.starmap(cat, [(fs, TEST_ROOT + "/write"), (fs, TEST_ROOT + "/multi")]) == [REF_CONTENT] * 2
+
+    # the parent's connections still work
+    assert fs.cat_file(TEST_ROOT + "/raw_multi") == REF_CONTENT
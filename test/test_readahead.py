@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import pytest
+from dagbuilder import import_blocks
+from ipfsspec.importer import ImportLayout
+from ipfsspec.readahead import ReadAhead
+
+LEAF_SIZE = 1000
+UNIT_SIZE = 1500
+
+
+def make_file(content):
+    root, blocks, _ = import_blocks(content, ImportLayout(LEAF_SIZE, True, 1, "sha2-256", max_links=4))
+    return root, blocks
+
+
+class SlowBlocks:
+    def __init__(self, blocks, delay=0.005):
+        self.blocks = blocks
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_block(self, cid, size=None):
+        self.requests.append(cid)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return self.blocks[cid]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def content():
+    return random.Random(0).randbytes(40 * LEAF_SIZE + 123)
+
+
+@pytest.mark.asyncio
+async def test_sequential_reads_grow_window(content):
+    root, blocks = make_file(content)
+    source = SlowBlocks(blocks)
+    readahead = ReadAhead(source.get_block, root, len(content), max_bytes=8 * LEAF_SIZE, unit_bytes=UNIT_SIZE)
+
+    pieces = []
+    for start in range(0, len(content), 300):
+        pieces.append(await readahead.read(start, start + 300))
+        assert readahead.pending_bytes <= 8 * LEAF_SIZE + 2 * LEAF_SIZE
+    assert b"".join(pieces) == content
+    assert readahead.window == readahead.max_window == 5
+    assert source.max_in_flight > 1
+    assert len(source.requests) == len(set(source.requests)) == len(blocks)
+    readahead.close()
+
+
+@pytest.mark.asyncio
+async def test_random_access_resets_window(content):
+    root, blocks = make_file(content)
+    source = SlowBlocks(blocks)
+    readahead = ReadAhead(source.get_block, root, len(content), max_bytes=8 * LEAF_SIZE, unit_bytes=UNIT_SIZE)
+
+    for start in range(0, 10 * LEAF_SIZE, LEAF_SIZE):
+        assert await readahead.read(start, start + LEAF_SIZE) == content[start:start + LEAF_SIZE]
+    assert readahead.window > 1
+
+    assert await readahead.read(30 * LEAF_SIZE + 5, 30 * LEAF_SIZE + 2005) == content[30 * LEAF_SIZE + 5:30 * LEAF_SIZE + 2005]
+    assert readahead.window == 1
+    assert await readahead.read(len(content) - 50, len(content) + 50) == content[-50:]
+    readahead.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_failed_read(content):
+    root, blocks = make_file(content)
+    source = SlowBlocks(blocks)
+    failing = {next(cid for cid, block in blocks.items() if block == content[:LEAF_SIZE])}
+
+    async def get_block(cid, size=None):
+        if cid in failing:
+            failing.remove(cid)
+            raise ConnectionError("transient error")
+        return await source.get_block(cid, size)
+
+    readahead = ReadAhead(get_block, root, len(content), max_bytes=8 * LEAF_SIZE, unit_bytes=UNIT_SIZE)
+    with pytest.raises(ConnectionError):
+        await readahead.read(0, 500)
+    assert await readahead.read(0, 500) == content[:500]
+
+    # cancelled reads are fetched again as well
+    read = asyncio.ensure_future(readahead.read(20 * LEAF_SIZE, 21 * LEAF_SIZE))
+    await asyncio.sleep(0)
+    read.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await read
+    assert await readahead.read(20 * LEAF_SIZE, 21 * LEAF_SIZE) == content[20 * LEAF_SIZE:21 * LEAF_SIZE]
+    readahead.close()
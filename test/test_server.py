@@ -0,0 +1,175 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from ipfsspec.async_ipfs import AsyncIPFSGateway, AsyncIPFSFileSystem, gateway_from_file
+from ipfsspec.blockcache import MemoryBlockCache, DirectoryBlockCache
+from ipfsspec.server import GATEWAY_KEY, make_app
+from multiformats import CID
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+from mockserver import any_free_port
+
+TEST_ROOT = "QmW3CrGFuFyF3VH1wvrap4Jend5NRTgtESDjuQ7QhHD5dd"
+REF_CONTENT = b'ipfsspec test data'
+TEST_FILENAMES = ["default", "multi", "raw", "raw_multi", "write"]
+
+
+@pytest_asyncio.fixture(params=["memory", "directory"])
+async def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBlockCache()
+    else:
+        return DirectoryBlockCache(tmp_path / "blocks")
+
+
+@pytest_asyncio.fixture
+async def app(cache):
+    return make_app(AsyncIPFSGateway("http://127.0.0.1:8080"), cache)
+
+
+@pytest_asyncio.fixture
+async def server_url(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = any_free_port()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    yield f"http://127.0.0.1:{port}"
+    await runner.cleanup()
+
+
+@pytest_asyncio.fixture
+async def fs(server_url):
+    AsyncIPFSFileSystem.clear_instance_cache()  # avoid reusing old event loop
+    return AsyncIPFSFileSystem(asynchronous=True, loop=asyncio.get_running_loop(), gateway_addr=server_url)
+
+
+@pytest.mark.asyncio
+async def test_ls_through_cache(fs, cache):
+    res = await fs._ls(TEST_ROOT, detail=True)
+    assert [r["name"] for r in res] == [TEST_ROOT + fs.sep + fn for fn in TEST_FILENAMES]
+    assert all([r["size"] == len(REF_CONTENT) for r in res])
+    assert CID.decode(TEST_ROOT) in cache
+    with pytest.raises(FileNotFoundError):
+        await fs._info(TEST_ROOT + "/missing")
+
+
+@pytest.mark.parametrize("filename", TEST_FILENAMES)
+@pytest.mark.asyncio
+async def test_cat_through_cache(fs, app, filename):
+    assert await fs._cat_file(TEST_ROOT + "/" + filename) == REF_CONTENT
+    assert await fs._info(TEST_ROOT + "/" + filename)
+
+    # further requests must be answered from the cache
+    app[GATEWAY_KEY].upstream = AsyncIPFSGateway("http://127.0.0.1:1")
+    assert await fs._cat_file(TEST_ROOT + "/" + filename) == REF_CONTENT
+    assert (await fs._info(TEST_ROOT + "/" + filename))["size"] == len(REF_CONTENT)
+
+
+@pytest.mark.asyncio
+async def test_export_through_cache(fs, tmp_path):
+    from ipfsspec import CARFileSystem
+    await fs._export_car(TEST_ROOT, tmp_path / "export.car")
+    carfs = CARFileSystem(tmp_path / "export.car", skip_instance_cache=True)
+    for fn in TEST_FILENAMES:
+        assert carfs.cat_file(f"{TEST_ROOT}/{fn}") == REF_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_gateway(tmp_path):
+    socket_path = str(tmp_path / "gateway.sock")
+    runner = web.AppRunner(make_app(AsyncIPFSGateway("http://127.0.0.1:8080"), MemoryBlockCache()))
+    await runner.setup()
+    await web.UnixSite(runner, socket_path).start()
+    try:
+        (tmp_path / "gateway").write_text("http+unix://" + quote(socket_path, safe="") + "\n")
+        assert gateway_from_file(tmp_path / "gateway").unix_socket == socket_path
+
+        AsyncIPFSFileSystem.clear_instance_cache()
+        fs = AsyncIPFSFileSystem(asynchronous=True, gateway_addr="http+unix://" + socket_path)
+        assert fs.gateway.unix_socket == socket_path
+        assert await fs._cat_file(TEST_ROOT + "/multi") == REF_CONTENT
+        assert len(await fs._ls(TEST_ROOT)) == len(TEST_FILENAMES)
+    finally:
+        await runner.cleanup()
+
+
+class HeldUpstream:
+    """
+    Upstream serving the test data, which holds CAR responses before block ``hold_at`` until ``release`` is set.
+    """
+    unix_socket = None
+
+    def __init__(self, hold_at=1):
+        from pathlib import Path
+        from ipfsspec.car import read_car
+        _, blocks = read_car((Path(__file__).parent / "testdata.car").read_bytes())
+        self.blocks = {cid: data for cid, data, _ in blocks}
+        self.hold_at = hold_at
+        self.requests = []
+        self.release = asyncio.Event()
+
+    def dfs(self, cid, seen):
+        from ipfsspec.dag import links
+        if cid not in seen:
+            seen.add(cid)
+            yield cid, self.blocks[cid]
+            for child in links(cid, self.blocks[cid]):
+                yield from self.dfs(child, seen)
+
+    @asynccontextmanager
+    async def iter_car(self, path, session, dag_scope="all"):
+        self.requests.append((path, dag_scope))
+
+        async def blocks():
+            for i, (cid, data) in enumerate(self.dfs(CID.decode(path), set())):
+                if i == self.hold_at:
+                    await self.release.wait()
+                yield cid, data, None
+        yield blocks()
+
+    async def block(self, cid, session):
+        self.requests.append((str(cid), "raw"))
+        return self.blocks[cid]
+
+
+@pytest.mark.asyncio
+async def test_stream_shared_misses():
+    from ipfsspec.server import CachingGateway
+    upstream = HeldUpstream()
+    gateway = CachingGateway(upstream, MemoryBlockCache(max_bytes=40))  # evicts most blocks right away
+    root = CID.decode(TEST_ROOT)
+
+    streams = [gateway.iter_blocks([root], "all") for _ in range(3)]
+    # the first block is passed on while the upstream response is still incomplete
+    firsts = await asyncio.wait_for(asyncio.gather(*(stream.__anext__() for stream in streams)), 5)
+    assert [cid for cid, _ in firsts] == [root] * 3
+    upstream.release.set()
+
+    async def consume(stream):
+        return [block async for block in stream]
+
+    rest = await asyncio.gather(*(consume(stream) for stream in streams))
+    assert all(len(blocks) == len(upstream.blocks) - 1 for blocks in rest)
+    assert upstream.requests == [(TEST_ROOT, "all")]
+
+
+@pytest.mark.asyncio
+async def test_stream_after_cancelled_fill():
+    from ipfsspec.server import CachingGateway
+    upstream = HeldUpstream(hold_at=0)
+    gateway = CachingGateway(upstream, MemoryBlockCache())
+
+    first = asyncio.ensure_future(gateway.stream(TEST_ROOT, "all").__anext__())
+    await asyncio.sleep(0.01)
+    # the second request arrives while the fill of the first one is being cancelled
+    first.cancel()
+    second = asyncio.ensure_future(gateway.stream(TEST_ROOT, "all").__anext__())
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    upstream.release.set()
+    cid, _ = await asyncio.wait_for(second, 5)
+    assert str(cid) == TEST_ROOT
+    assert len(upstream.requests) == 2